@@ -239,11 +239,12 @@ class Router:
     #  @param i Incoming interface number for packet p
     def forward_packet(self, p, i):
         try:
-            # TODO: Here you will need to implement a lookup into the 
-            # forwarding table to find the appropriate outgoing interface
-            # for now we assume the outgoing interface is 1
+            #look the outgoing interface up in the forwarding table
             dest = p.dst
             intF = self.table.getBestRoute(dest)
+            if(intF is None):
+                print('%s: no route for packet "%s" from interface %d' % (self, p, i))
+                return
             self.intf_L[intF].put(p.to_byte_S(), 'out', True)
             print('%s: forwarding packet "%s" from interface %d to %d' % \
                 (self, p, i, intF))
@@ -306,6 +307,8 @@ class RoutingTable:
             if(key[0] == 'R'):
                 self.routers.append(key)
                 self.costDicts[key] = -1
+        self.fib = {}   # {destination: interface}
+        self.compileFIB()
 
     def bestPath(self, dest):
         return -1 #out interface 
@@ -332,11 +335,24 @@ class RoutingTable:
         else:
             return (self.getCostOf(router, self.name) + self.getCostOf(dest, self.name))
 
+    ## forwarding lookup, a single dict probe into the compiled FIB
+    # @param dest: destination name
+    # @return outgoing interface, or None if there is no route
     def getBestRoute(self, dest):
-        dv = self.DVother(dest, self.name)
-        intF = self.intF_Of(dv[0])
-        print("DV Best Path: Fwd pkt's from " + str(self.name) + " to " + str(dest) + " along interface " + str(intF))
-        return intF #interface
+        return self.fib.get(dest) #interface
+
+    ## compile the {destination: interface} forwarding table from the routing state
+    # called whenever updateTable changes something, so forwarding never runs DV
+    def compileFIB(self):
+        fib = {}
+        for dest in self.dests:
+            if(dest == self.name):
+                continue
+            dv = self.DVother(dest, self.name)
+            intF = self.intF_Of(dv[0])
+            if((intF is not None) and (intF >= 0)):
+                fib[dest] = intF
+        self.fib = fib
 
     def getRouters(self):
         return self.routers
@@ -361,7 +377,9 @@ class RoutingTable:
                     if(int(intF) == int(intF_in)):
                         r = key
 
-        self.costDicts[r] = RoutingTable.fromStr(dataIn)
+        rTable = RoutingTable.fromStr(dataIn)
+        tableChanged = (self.costDicts.get(r) != rTable)
+        self.costDicts[r] = rTable
 
         rTable = self.costDicts[r]
         for key in rTable:
@@ -390,6 +408,8 @@ class RoutingTable:
                     changed = True
                     print("InUpdate:whatDo?NothingChangedButItShouldHave")
                     this = thisDict[key]
+        if(changed or tableChanged):
+            self.compileFIB()
         return changed
 
     def intF_Of(self, node):
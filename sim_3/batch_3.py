@@ -0,0 +1,71 @@
+import time
+import numpy as np
+from rprint import print
+from network_3 import NetworkPacket
+
+## Vectorized batch forwarding against an array copy of the FIB.
+# The destination fields of a whole batch of raw packets are matched with one
+# searchsorted over the sorted destinations of the FIB, and the outgoing
+# interfaces come out of one fancy-index into the matching next hop array.
+# Packets the arrays cannot settle (control, group or numeric destinations,
+# ECMP destinations, down interfaces) take the usual per-packet path.
+
+
+## array form of one FIBSnapshot
+class ArrayFIB:
+
+    ##@param snap: FIBSnapshot to copy
+    # @param ecmp: leave destinations with several next hops to the per-packet path
+    def __init__(self, snap, ecmp):
+        self.version = snap.version
+        n = NetworkPacket.dst_S_length
+        #longer names (prefixes like '4096/12') never fit a destination field,
+        # the fixed-width array would truncate them into false matches
+        dests = sorted(str(dest).zfill(n) for dest in snap.fib if len(str(dest)) <= n)
+        self.keys = np.array(dests, dtype='U%d' % n)
+        self.nexthop = np.full(len(dests), -1, dtype=np.int16)
+        for k, dest_S in enumerate(dests):
+            dest = dest_S.lstrip('0')
+            if(not (ecmp and snap.multipath.get(dest))):
+                self.nexthop[k] = snap.fib[dest]
+
+    ## outgoing interface of each destination field, -1 where the arrays cannot tell
+    # @param dst: array of raw destination fields
+    def lookup(self, dst):
+        if(len(self.keys) == 0):
+            return np.full(len(dst), -1, dtype=np.int16)
+        pos = np.minimum(np.searchsorted(self.keys, dst), len(self.keys) - 1)
+        return np.where(self.keys[pos] == dst, self.nexthop[pos], -1)
+
+
+## array FIB of the router's current snapshot, rebuilt only when a new one is published
+def array_fib(router):
+    snap = router.table.publisher.current
+    if((router.array_fib is None) or (router.array_fib.version != snap.version)):
+        router.array_fib = ArrayFIB(snap, router.ecmp)
+    return router.array_fib
+
+
+## forward a batch of raw packets
+# @param router: Router the packets arrived at
+# @param batch: list of [packet string, incoming interface]
+def forward_batch(router, batch):
+    fib = array_fib(router)
+    n = NetworkPacket.dst_S_length
+    pkt_L = [b[0] for b in batch]
+    dst = np.array([s[:n] for s in pkt_L], dtype='U%d' % n)
+    prot = np.array([s[2 * n] for s in pkt_L], dtype='U1')
+    out = np.where(prot == '1', fib.lookup(dst), -1)
+    if(router.down_intf):
+        out[np.isin(out, list(router.down_intf))] = -1
+    fast = np.flatnonzero(out >= 0)
+    now = time.time()
+    for k, intF in zip(fast.tolist(), out[fast].tolist()):
+        router.intf_L[intF].put(pkt_L[k], 'out', True)
+        if(router.load_aware and (batch[k][1] in router.router_intf_L)):
+            router.transit_D[intF] = now
+    if(len(fast)):
+        #one line per batch, printing every packet would undo the batching
+        print('%s: forwarded %d packets in a batch' % (router, len(fast)))
+    for k in np.flatnonzero(out < 0).tolist():
+        router.handle_packet(pkt_L[k], batch[k][1])
@@ -0,0 +1,91 @@
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import zlib
+
+## Snapshots of every router's routes as JSON or CSV, so converged tables
+# can be saved and diffed between runs instead of scraped from stdout, and
+# compact saved tables that later runs on the same topology load instead of
+# converging again.
+
+
+## routes of all routers, keyed by router name
+# @param router_L: list of Router objects
+# @return {router: {destination: {'interface', 'cost', 'via', 'hops'}}}
+def snapshot(router_L):
+    return {r.name: r.snapshot()['routes'] for r in router_L}
+
+
+## JSON text of a snapshot, keys sorted so equal tables give equal text
+def to_json(snap):
+    return json.dumps(snap, indent=2, sort_keys=True)
+
+
+## CSV text of a snapshot, one row per (router, destination)
+def to_csv(snap):
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(['router', 'destination', 'interface', 'cost', 'via', 'hops'])
+    for r in sorted(snap):
+        for dest in sorted(snap[r]):
+            route = snap[r][dest]
+            writer.writerow([r, dest, route['interface'], route['cost'], route['via'],
+                             ' '.join(str(i) for i in route['hops'])])
+    return out.getvalue()
+
+
+## write the routes of all routers to a file
+# @param router_L: list of Router objects
+# @param path: file to write, CSV if it ends in '.csv' and JSON otherwise
+def export_routes(router_L, path):
+    snap = snapshot(router_L)
+    text = to_csv(snap) if path.endswith('.csv') else to_json(snap)
+    with open(path, 'w') as f:
+        f.write(text)
+    return snap
+
+
+## fingerprint of a topology, changes whenever any router's links or prefixes do
+# @param router_L: list of Router objects
+def fingerprint(router_L):
+    topo = {r.name: [sorted([n, sorted(r.cost_D[n].items())] for n in r.cost_D),
+                     sorted([p, sorted(r.prefix_D[p].items())] for p in r.prefix_D)]
+            for r in router_L}
+    return hashlib.sha1(json.dumps(topo, sort_keys=True).encode()).hexdigest()
+
+
+## save converged routes along with the fingerprint of the topology they belong to
+# @param router_L: list of Router objects
+# @param path: file to write (gzipped JSON), replaced in one step so an
+#   interrupted run never leaves a truncated file behind
+def save_routes(router_L, path):
+    state = {'fingerprint': fingerprint(router_L),
+             'routes': {r.name: {str(dest): list(route) for dest, route in r.table.routes.items()}
+                        for r in router_L}}
+    tmp = path + '.tmp'
+    with gzip.open(tmp, 'wt') as f:
+        json.dump(state, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+## install routes saved by save_routes if they were computed for this topology
+# @param router_L: list of Router objects
+# @param path: file written by save_routes
+# @return True if the routes were loaded, False if the file is missing, unreadable or stale
+def load_routes(router_L, path):
+    try:
+        with gzip.open(path, 'rt') as f:
+            state = json.load(f)
+    except (OSError, EOFError, ValueError, zlib.error):
+        return False
+    if((not isinstance(state, dict)) or (state.get('fingerprint') != fingerprint(router_L))):
+        return False
+    routes_D = state.get('routes')
+    if((not isinstance(routes_D, dict)) or any(not isinstance(routes_D.get(r.name), dict) for r in router_L)):
+        return False
+    for r in router_L:
+        r.table.loadRoutes(routes_D[r.name])
+    return True
@@ -0,0 +1,71 @@
+import weakref
+from types import MappingProxyType
+from prefix_3 import build_trie
+
+## Versioned, read-only forwarding state (read-copy-update style).
+# The control plane builds a new FIBSnapshot after each routing change and
+# swaps it in with a single reference assignment. The data plane reads the
+# reference once per packet and does every lookup against that snapshot, so
+# it needs no lock and never sees half an update. A version nobody holds any
+# more is freed by reference counting.
+
+
+## one published version of a router's forwarding state, never changed once built
+class FIBSnapshot:
+    __slots__ = ('version', 'fib', 'multipath', 'backup', 'lpm', '__weakref__')
+
+    ##@param version: number of this snapshot, increasing per table
+    # @param fib: {destination: interface}
+    # @param multipath: {destination: (interface, ...)} equal-cost next hops
+    # @param backup: {destination: interface} loop-free alternates to use when the primary is down
+    def __init__(self, version, fib, multipath, backup):
+        self.version = version
+        self.fib = MappingProxyType(fib)
+        self.multipath = MappingProxyType(multipath)
+        self.backup = MappingProxyType(backup)
+        self.lpm = build_trie(fib)  # longest-prefix match over prefix destinations
+
+    ## outgoing interface for a destination, None if there is no route
+    def lookup(self, dest):
+        return self.fib.get(dest)
+
+
+## publishes FIBSnapshots for one table and remembers which are still in use
+class FIBPublisher:
+
+    def __init__(self):
+        self.version = 0
+        self.current = FIBSnapshot(0, {}, {}, {})
+        self.live = weakref.WeakValueDictionary() # {version: snapshot} still held by someone
+        self.live[0] = self.current
+
+    ## swap in a new snapshot built from fresh dicts the caller no longer touches
+    # @return the new snapshot
+    def publish(self, fib, multipath, backup):
+        snap = FIBSnapshot(self.version + 1, fib, multipath, backup)
+        self.live[snap.version] = snap
+        self.version = snap.version
+        self.current = snap
+        return snap
+
+    ## versions not yet reclaimed, the current one included
+    def liveVersions(self):
+        return sorted(self.live.keys())
+
+
+## cheapest loop-free alternate for one destination
+# neighbor n protects destination d if dist(n, d) < dist(n, us) + dist(us, d):
+# then n's own path to d cannot lead back through us (RFC 5286, inequality 1)
+# @param primary: interface the route uses now
+# @param cost: our cost to the destination
+# @param candidates: iterable of [dist(n, d), dist(n, us), {interface: link cost}] per neighbor
+# @return interface of the alternate, None if no neighbor qualifies
+def loop_free_alternate(primary, cost, candidates):
+    best = None
+    for to_dest, to_us, intf_D in candidates:
+        if(to_dest >= to_us + cost):
+            continue
+        for intF, c in intf_D.items():
+            if((intF != primary) and ((best is None) or ((c + to_dest, intF) < best))):
+                best = (c + to_dest, intF)
+    return None if best is None else best[1]
@@ -1,5 +1,7 @@
 import queue
 import threading
+import selectors
+import socket
 from rprint import print
 
 ## An abstraction of a link between router interfaces
@@ -40,6 +42,111 @@ class Link:
                 print('%s: direction %s-%s -> %s-%s: packet lost' % \
                     (self, node_a, node_a_intf, node_b, node_b_intf))
                 pass
+
+    ## release any resources held by the link (nothing for in-memory links)
+    def close(self):
+        pass
+
+
+## One end of a link carried over a UDP socket, so nodes may live in separate processes
+class UdpEndpoint:
+    ## largest datagram we expect to receive
+    max_dgram_size = 65507
+    ## max number of packets moved in each direction per tx_pkt call
+    batch_size = 64
+
+    ## binds a non-blocking UDP socket for a node interface
+    # @param node: node whose interface is attached to this end
+    # @param node_intf: number of the interface on that node
+    # @param port: local port to bind, 0 lets the kernel pick one
+    # @param peer_addr: (host, port) of the far end, may be set after creation
+    # @param host: local address to bind
+    def __init__(self, node, node_intf, port=0, peer_addr=None, host='127.0.0.1'):
+        self.node = node
+        self.node_intf = node_intf
+        self.peer_addr = peer_addr
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.sock.bind((host, port))
+        self.addr = self.sock.getsockname()
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ)
+
+    ## called when printing the object
+    def __str__(self):
+        return 'UdpEndpoint %s-%d %s:%d' % (self.node, self.node_intf, self.addr[0], self.addr[1])
+
+    ## send queued outgoing packets to the peer in one batch
+    def send_batch(self):
+        intf = self.node.intf_L[self.node_intf]
+        for _ in range(self.batch_size):
+            pkt_S = intf.get('out')
+            if pkt_S is None:
+                return
+            try:
+                self.sock.sendto(pkt_S.encode(), self.peer_addr)
+            except (BlockingIOError, ConnectionRefusedError):
+                print('%s: packet lost' % self)
+
+    ## move every datagram waiting on the socket into the node's in queue
+    def recv_batch(self):
+        intf = self.node.intf_L[self.node_intf]
+        if not self.selector.select(0):
+            return
+        for _ in range(self.batch_size):
+            try:
+                data = self.sock.recv(self.max_dgram_size)
+            except (BlockingIOError, ConnectionRefusedError):
+                return
+            try:
+                intf.put(data.decode(), 'in')
+            except queue.Full:
+                print('%s: packet lost' % self)
+
+    ## transmit pending packets and deliver received ones
+    def tx_pkt(self):
+        if self.peer_addr is not None:
+            self.send_batch()
+        self.recv_batch()
+
+    ## close the socket
+    def close(self):
+        self.selector.close()
+        self.sock.close()
+
+
+## A Link whose two ends exchange packets over loopback UDP sockets
+class UdpLink:
+
+    ## creates a link between two nodes in this process over a pair of UDP sockets
+    # @param node_1: node from which data will be transfered
+    # @param node_1_intf: number of the interface on that node
+    # @param node_2: node to which data will be transfered
+    # @param node_2_intf: number of the interface on that node
+    # @param port_1, port_2: local ports for each end, 0 lets the kernel pick
+    def __init__(self, node_1, node_1_intf, node_2, node_2_intf, port_1=0, port_2=0):
+        self.node_1 = node_1
+        self.node_1_intf = node_1_intf
+        self.node_2 = node_2
+        self.node_2_intf = node_2_intf
+        self.end_1 = UdpEndpoint(node_1, node_1_intf, port_1)
+        self.end_2 = UdpEndpoint(node_2, node_2_intf, port_2, self.end_1.addr)
+        self.end_1.peer_addr = self.end_2.addr
+        print('Created link %s' % self.__str__())
+
+    ## called when printing the object
+    def __str__(self):
+        return 'UdpLink %s-%d - %s-%d' % (self.node_1, self.node_1_intf, self.node_2, self.node_2_intf)
+
+    ##transmit packets between interfaces in each direction
+    def tx_pkt(self):
+        self.end_1.tx_pkt()
+        self.end_2.tx_pkt()
+
+    ## close both sockets
+    def close(self):
+        self.end_1.close()
+        self.end_2.close()
         
         
 ## An abstraction of the link layer
@@ -71,6 +178,8 @@ class LinkLayer:
             self.transfer()
             #terminate
             if self.stop:
+                for link in self.link_L:
+                    link.close()
                 print (threading.currentThread().getName() + ': Ending')
                 return
     
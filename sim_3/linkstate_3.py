@@ -0,0 +1,453 @@
+import heapq
+import time
+from fib_3 import FIBPublisher, loop_free_alternate
+
+
+## Shortest path tree rooted at one node, kept up to date incrementally
+# graph edges are directed {node: {neighbor: cost}}, as announced by each node
+class ShortestPathTree:
+
+    ##@param root: node the tree is rooted at
+    # @param graph: optional initial graph {node: {neighbor: cost}}
+    def __init__(self, root, graph=None):
+        self.root = root
+        self.graph = {}      # {node: {neighbor: cost}}
+        self.rgraph = {}     # {node: {predecessor: cost}}
+        self.dist = {}       # {node: cost from root}
+        self.parent = {}     # {node: predecessor on the tree}
+        self.children = {}   # {node: set of nodes whose parent it is}
+        self.firsthop = {}   # {node: neighbor of root the path leaves through}
+        if(graph is not None):
+            for node in graph:
+                self.setGraphEdges(node, graph[node])
+        self.compute()
+
+    ## copy of the tree, sharing nothing mutable with this one
+    def copy(self):
+        other = ShortestPathTree.__new__(ShortestPathTree)
+        other.root = self.root
+        other.graph = {u: dict(self.graph[u]) for u in self.graph}
+        other.rgraph = {v: dict(self.rgraph[v]) for v in self.rgraph}
+        other.dist = dict(self.dist)
+        other.parent = dict(self.parent)
+        other.children = {u: set(self.children[u]) for u in self.children}
+        other.firsthop = dict(self.firsthop)
+        return other
+
+    ## replace the out-edges of u without touching the tree
+    def setGraphEdges(self, u, edges):
+        for v in self.graph.get(u, {}):
+            del self.rgraph[v][u]
+        self.graph[u] = dict(edges)
+        for v in edges:
+            self.rgraph.setdefault(v, {})[u] = edges[v]
+
+    ## full Dijkstra from the root
+    def compute(self):
+        self.dist = {}
+        self.parent = {}
+        self.children = {}
+        self.firsthop = {}
+        self.settle([(0, self.root, None)])
+
+    ## attach node v to the tree through p at distance d
+    def attach(self, v, d, p):
+        old = self.parent.get(v)
+        if(old is not None):
+            self.children[old].discard(v)
+        self.dist[v] = d
+        self.parent[v] = p
+        if(p is None):
+            self.firsthop[v] = None
+        else:
+            self.children.setdefault(p, set()).add(v)
+            self.firsthop[v] = v if p == self.root else self.firsthop[p]
+
+    ## run Dijkstra from a heap of (cost, node, parent) candidates, only
+    # touching nodes whose distance improves
+    # @return set of nodes that were (re)attached
+    def settle(self, heap):
+        heapq.heapify(heap)
+        touched = set()
+        while heap:
+            d, v, p = heapq.heappop(heap)
+            if((v in self.dist) and (self.dist[v] <= d)):
+                continue
+            self.attach(v, d, p)
+            touched.add(v)
+            for w, c in self.graph.get(v, {}).items():
+                if((w not in self.dist) or (d + c < self.dist[w])):
+                    heapq.heappush(heap, (d + c, w, v))
+        return touched
+
+    ## nodes in the subtree under v, v included
+    def subtree(self, v):
+        nodes = set()
+        stack = [v]
+        while stack:
+            n = stack.pop()
+            nodes.add(n)
+            stack.extend(self.children.get(n, ()))
+        return nodes
+
+    ## replace the out-edges of u and repair only the affected part of the tree
+    # edges that got worse detach and re-attach the subtree hanging off them,
+    # edges that got better are propagated forward from u
+    # @param u: node whose edges changed
+    # @param edges: its new {neighbor: cost}
+    # @return set of nodes whose distance or first hop changed
+    def setEdges(self, u, edges):
+        old = self.graph.get(u, {})
+        self.setGraphEdges(u, edges)
+        raised = [v for v in old if (v not in edges) or (edges[v] > old[v])]
+        lowered = [v for v in edges if (v not in old) or (edges[v] < old[v])]
+        orphans = set()
+        for v in raised:
+            if(self.parent.get(v) == u):
+                orphans |= self.subtree(v)
+        before = {}
+        for n in orphans:
+            before[n] = (self.dist[n], self.firsthop[n])
+            self.children.get(self.parent[n], set()).discard(n)
+            del self.dist[n]
+            del self.parent[n]
+            del self.firsthop[n]
+            self.children.pop(n, None)
+        heap = []
+        for n in orphans:
+            for p, c in self.rgraph.get(n, {}).items():
+                if(p in self.dist):
+                    heap.append((self.dist[p] + c, n, p))
+        if(u in self.dist):
+            for v in lowered:
+                if(v == self.root):
+                    continue
+                if((v not in self.dist) or (self.dist[u] + edges[v] < self.dist[v])):
+                    heap.append((self.dist[u] + edges[v], v, u))
+        for n in self.dist:
+            if(n not in before):
+                before[n] = (self.dist[n], self.firsthop[n])
+        moved = self.settle(heap) - set(before)
+        for n in before:
+            now = (self.dist[n], self.firsthop[n]) if n in self.dist else None
+            if(now != before[n]):
+                moved.add(n)
+        return moved
+
+    ## nodes on the tree path from the root to v, both included
+    def path(self, v):
+        if(v not in self.dist):
+            return None
+        path_L = [v]
+        while self.parent[path_L[-1]] is not None:
+            path_L.append(self.parent[path_L[-1]])
+        path_L.reverse()
+        return path_L
+
+
+## Link-state routing table
+# Floods one compact advertisement (LSA) per router listing its neighbors and
+# costs, and computes routes with Dijkstra over the collected LSAs. Exposes
+# the same interface as RoutingTable so a Router can use either.
+class LinkStateTable:
+    ## cost meaning "unreachable", kept for parity with RoutingTable
+    infinity = 64
+
+    ##@param cost_D: cost table to neighbors {neighbor: {interface: cost}}
+    # @param name: name of the router owning this table
+    # @param prefix_D: attached address prefixes {'address/length': {interface: cost}}
+    # @param server: routes come from a RouteServer through applyDelta, the local
+    #   tree only provides the direct routes we start with
+    def __init__(self, cost_D, name, prefix_D=None, server=False):
+        self.name = name
+        self.costD = cost_D
+        self.server = server
+        self.links = {}         # {neighbor: [interface, cost]} cheapest interface to each neighbor
+        self.intfNeighbor = {}  # {interface: neighbor}
+        self.routes = {}        # {destination: [interface, cost, via]} current best routes
+        self.routers = [self.name]   # rows shown when printing, only our own costs are known
+        self.dests = [self.name]
+        for key in cost_D:
+            intF = min(cost_D[key], key=lambda i: (cost_D[key][i], i))
+            self.links[key] = [intF, cost_D[key][intF]]
+            for i in cost_D[key]:
+                self.intfNeighbor[i] = key
+            self.dests.append(key)
+        #attached prefixes go into our LSA like neighbors that never send one
+        for key in (prefix_D or {}):
+            intF = min(prefix_D[key], key=lambda i: (prefix_D[key][i], i))
+            self.links[key] = [intF, prefix_D[key][intF]]
+            self.dests.append(key)
+        self.seq = 1
+        self.lsdb = {self.name: [self.seq, self.linkCosts()]}  # {router: [seq, {neighbor: cost}]}
+        self.heard = {}     # {router: time its current LSA arrived}
+        self.garbage = {}   # {router: time its expired LSA is dropped}
+        self.spt = ShortestPathTree(self.name, {self.name: self.lsdb[self.name][1]})
+        self.nbrTrees = {}  # {neighboring router: ShortestPathTree rooted at it} for alternates
+        self.publisher = FIBPublisher()  # read-only forwarding snapshots for the data plane
+        self.hops = {}
+        self.refresh(set(self.spt.dist))
+
+    ## our own {neighbor: cost}, as advertised in our LSA
+    def linkCosts(self):
+        return {n: self.links[n][1] for n in self.links}
+
+    ## cost from router to dest, only known for this router
+    def getCostOf(self, dest, router):
+        if(dest == router):
+            return 0
+        if((router != self.name) or (dest not in self.routes)):
+            return -1
+        return self.routes[dest][1]
+
+    ## forwarding lookup, a single dict probe into the compiled FIB
+    # @param dest: destination name
+    # @return outgoing interface, or None if there is no route
+    def getBestRoute(self, dest):
+        return self.publisher.current.lookup(dest) #interface
+
+    ## @param backup: alternates if the caller already computed them
+    def compileFIB(self, backup=None):
+        self.publisher.publish({dest: self.routes[dest][0] for dest in self.routes}, dict(self.hops),
+                               self.alternates() if backup is None else backup)
+
+    ## republish the FIB if the graph changed the alternates but no route
+    def refreshAlternates(self):
+        backup = self.alternates()
+        if(backup != self.publisher.current.backup):
+            self.compileFIB(backup)
+
+    ## replace the edges of u in our tree and in every neighbor's tree
+    # the neighbors' trees are repaired incrementally like ours, a full
+    # Dijkstra only runs once per neighbor when its first LSA arrives
+    # @return set of nodes whose route from us moved
+    def setEdges(self, u, edges):
+        for tree in self.nbrTrees.values():
+            tree.setEdges(u, edges)
+        moved = self.spt.setEdges(u, edges)
+        if((u in self.links) and (u not in self.nbrTrees)):
+            self.nbrTrees[u] = ShortestPathTree(u, self.spt.graph)
+        return moved
+
+    ## loop-free alternate interface of every destination that has one
+    # distances from each neighboring router come from a tree rooted at it
+    # @return {destination: interface}
+    def alternates(self):
+        trees = self.nbrTrees
+        backup = {}
+        for dest in self.routes:
+            intF, cost, via = self.routes[dest]
+            candidates = []
+            for n in self.links:
+                if(n == dest):
+                    to_dest = 0
+                    to_us = self.links[n][1]
+                elif((n in trees) and (n in self.lsdb)):
+                    to_dest = trees[n].dist.get(dest, self.infinity)
+                    to_us = trees[n].dist.get(self.name, self.links[n][1])
+                else:
+                    continue
+                if(to_dest < self.infinity):
+                    candidates.append([to_dest, to_us, self.costD.get(n, {self.links[n][0]: self.links[n][1]})])
+            alt = loop_free_alternate(intF, cost, candidates)
+            if(alt is not None):
+                backup[dest] = alt
+        return backup
+
+    ## equal-cost first hops of every reachable node
+    # one pass over the shortest path DAG in order of distance, so it also
+    # notices ties that did not move anything on the tree
+    # @return {destination: (interface, ...)} for nodes with more than one
+    def equalCostHops(self):
+        dist = self.spt.dist
+        first = {}
+        hops = {}
+        for v in sorted(dist, key=dist.get):
+            first[v] = set()
+            for p, c in self.spt.rgraph.get(v, {}).items():
+                if((p in dist) and (dist[p] + c == dist[v])):
+                    first[v] |= {v} if p == self.name else first[p]
+            intfs = {self.links[n][0] for n in first[v]}
+            if(len(intfs) > 1):
+                hops[v] = tuple(sorted(intfs))
+        return hops
+
+    def getRouters(self):
+        return self.routers
+
+    def getDests(self):
+        return self.dests
+
+    ## replace the routes with ones computed elsewhere (e.g. route_matrix_3)
+    # @param routes: {destination: [interface, cost, via]}
+    def loadRoutes(self, routes):
+        for dest in routes:
+            if(dest not in self.dests):
+                self.dests.append(dest)
+        self.routes = {dest: list(routes[dest]) for dest in routes}
+        self.hops = {}
+        self.compileFIB()
+
+    ## interface used to reach a directly connected neighbor
+    def intF_Of(self, node):
+        if(node in self.links):
+            return self.links[node][0]
+        return -1
+
+    ## bring routes for the given nodes in line with the shortest path tree
+    # @return list of destinations whose route changed
+    def refresh(self, nodes):
+        changed = []
+        for dest in nodes:
+            if(dest == self.name):
+                continue
+            if(dest not in self.dests):
+                self.dests.append(dest)
+            if(dest in self.spt.dist):
+                via = self.spt.firsthop[dest]
+                route = [self.links[via][0], self.spt.dist[dest], via]
+            else:
+                route = None
+            if(route == self.routes.get(dest)):
+                continue
+            if(route is None):
+                del self.routes[dest]
+            else:
+                self.routes[dest] = route
+            changed.append(dest)
+        hops = self.equalCostHops()
+        for dest in set(hops) | set(self.hops):
+            if((hops.get(dest) != self.hops.get(dest)) and (dest not in changed)):
+                changed.append(dest)
+        self.hops = hops
+        if(changed):
+            self.compileFIB()
+        return changed
+
+    ## install an LSA from another router
+    # @param dataIn: LSA as produced by toStr
+    # @return list of destinations whose route changed, None if the LSA was
+    #   old or a duplicate and must not be flooded further
+    def installLSA(self, dataIn):
+        name, seq, edges = LinkStateTable.fromStr(dataIn)
+        if(name == self.name):
+            return None
+        old = self.lsdb.get(name)
+        if((old is not None) and (old[0] >= seq)):
+            return None
+        self.lsdb[name] = [seq, edges]
+        self.heard[name] = time.time()
+        self.garbage.pop(name, None)
+        changed = self.refresh(self.setEdges(name, edges))
+        if(not changed):
+            #the routes held but the alternates depend on the whole graph
+            self.refreshAlternates()
+        return changed
+
+    ## True if an LSA only renews the links we already hold for its router
+    def isRefresh(self, dataIn):
+        name, seq, edges = LinkStateTable.fromStr(dataIn)
+        old = self.lsdb.get(name)
+        return (old is not None) and (old[1] == edges)
+
+    ## start a new instance of our own LSA so neighbors keep it alive
+    def refreshLSA(self):
+        self.seq += 1
+        self.lsdb[self.name] = [self.seq, self.linkCosts()]
+
+    ## change the cost of the link to a neighbor, e.g. as its load changes;
+    # starts a new instance of our LSA carrying it
+    # @return list of destinations whose route changed
+    def setLinkCost(self, neighbor, cost):
+        if(self.links[neighbor][1] == cost):
+            return []
+        self.links[neighbor][1] = cost
+        self.refreshLSA()
+        if(self.server):
+            return [] #the server recomputes our routes from the new LSA
+        changed = self.refresh(self.setEdges(self.name, self.lsdb[self.name][1]))
+        if(not changed):
+            self.refreshAlternates()
+        return changed
+
+    ## age out LSAs not refreshed within timeout: their links are withdrawn
+    # and the entry is kept for gc seconds before it is dropped
+    # @return list of destinations whose route changed
+    def expireRoutes(self, now, timeout, gc):
+        if(self.server):
+            return [] #we hold no LSA but our own, routes only change through the server
+        moved = set()
+        expired = False
+        for name in list(self.heard):
+            if(now - self.heard[name] < timeout):
+                continue
+            del self.heard[name]
+            self.lsdb[name][1] = {}
+            self.garbage[name] = now + gc
+            moved |= self.setEdges(name, {})
+            expired = True
+        for name in list(self.garbage):
+            if(self.garbage[name] <= now):
+                del self.garbage[name]
+                del self.lsdb[name]
+        changed = self.refresh(moved)
+        if(expired and not changed):
+            self.refreshAlternates()
+        return changed
+
+    ## install route changes pushed by a RouteServer
+    # @param dataIn: 'SERVER;dest:via:cost;...', a cost of infinity withdraws the route
+    # @return list of destinations whose route changed
+    def applyDelta(self, dataIn):
+        changed = []
+        for entry in dataIn.split(';')[1:]:
+            if(entry == ''):
+                continue
+            dest, via, cost = entry.split(':')
+            cost = int(cost)
+            if((cost < self.infinity) and (via in self.links)):
+                route = [self.links[via][0], cost, via]
+            else:
+                route = None
+            if(route == self.routes.get(dest)):
+                continue
+            if(dest not in self.dests):
+                self.dests.append(dest)
+            if(route is None):
+                del self.routes[dest]
+            else:
+                self.routes[dest] = route
+            changed.append(dest)
+        if(changed):
+            self.compileFIB()
+        return changed
+
+    ## same contract as RoutingTable.updateTable
+    def updateTable(self, intF_in, dataIn):
+        changed = self.installLSA(dataIn)
+        return [] if changed is None else changed
+
+    def __str__(self):
+        return self.toStr()
+
+    ## our own LSA, the same on every interface
+    def toStr(self, outIntF=None, poison=True):
+        seq, edges = self.lsdb[self.name]
+        retS = str(self.name) + '@' + str(seq) + ';'
+        for n in edges:
+            retS += str(n) + ':' + str(edges[n]) + ';'
+        return retS
+
+    ## parse an LSA
+    # @return [router, sequence number, {neighbor: cost}]
+    @staticmethod
+    def fromStr(s):
+        entries = s.split(';')
+        name, seq = entries[0].split('@')
+        edges = {}
+        for entry in entries[1:]:
+            if(len(entry) < 2):
+                continue
+            n, cost = entry.split(':')
+            edges[n] = int(cost)
+        return [name, int(seq), edges]
@@ -1,6 +1,53 @@
 import queue
 import threading
+import time
+import random
+import zlib
+import collections
+from array import array
 from rprint import print
+from linkstate_3 import LinkStateTable, ShortestPathTree
+from fib_3 import FIBPublisher, loop_free_alternate
+from prefix_3 import addr_bits
+
+
+## hash of a flow, so all packets between one (src, dst) pair take the same path
+def flow_hash(src, dst):
+    return zlib.crc32(('%s>%s' % (src, dst)).encode())
+
+
+## True if two advertisements carry the same routes, LSA sequence numbers aside
+# both start with the advertising router: 'name;...' or 'name@seq;...'
+def same_routes(a_S, b_S):
+    return (a_S is not None) and (b_S is not None) and (a_S.split(';', 1)[1] == b_S.split(';', 1)[1])
+
+
+## group addresses start with '*': '*' alone is broadcast, '*G1' a multicast group
+def is_group(dst):
+    return str(dst).startswith('*')
+
+
+## token bucket rate limiter
+# refills at rate tokens per second up to burst, each packet admitted takes one
+class TokenBucket:
+    ##@param rate: tokens added per second
+    # @param burst: most tokens the bucket holds
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.time()
+
+    ## take a token if there is one
+    # @param now: current time
+    # @return True if the packet conforms
+    def take(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if(self.tokens >= 1):
+            self.tokens -= 1
+            return True
+        return False
 
 
 ## wrapper class for a queue of packets
@@ -76,8 +123,8 @@ class NetworkPacket:
     # @param byte_S: byte string representation of the packet
     @classmethod
     def from_byte_S(self, byte_S):
-        dst = byte_S[0 : NetworkPacket.dst_S_length].strip('0')
-        src = byte_S[NetworkPacket.dst_S_length : int(NetworkPacket.dst_S_length*2)].strip('0')
+        dst = byte_S[0 : NetworkPacket.dst_S_length].lstrip('0')
+        src = byte_S[NetworkPacket.dst_S_length : int(NetworkPacket.dst_S_length*2)].lstrip('0')
         prot_S = byte_S[int(NetworkPacket.dst_S_length*2) : (int(NetworkPacket.dst_S_length*2)) + NetworkPacket.prot_S_length]
         if prot_S == '1':
             prot_S = 'data'
@@ -132,6 +179,8 @@ class Host:
             if(NetworkPacket.isControl(pkt_S) == False):
                 if(NetworkPacket.isACK(pkt_S) == False):
                     pkt = NetworkPacket.from_byte_S(pkt_S)
+                    if(is_group(pkt.dst)):
+                        return #no ACKs for group packets, every member would send one
                     ack_S = "ACK:" + str(pkt.src)
                     self.udt_send(pkt.src, ack_S)
                 
@@ -149,23 +198,190 @@ class Host:
         
 
 
+## Tracks control-plane activity across routers so a simulation can wait for
+# routing to settle instead of sleeping for a fixed time
+class ControlPlaneMonitor:
+
+    ##@param quiet_time: seconds with nothing in flight before the network counts as converged
+    def __init__(self, quiet_time=0.02):
+        self.lock = threading.Lock()
+        self.quiet_time = quiet_time
+        self.reset()
+
+    ## start a new measurement
+    def reset(self):
+        with self.lock:
+            self.in_flight = 0      # control packets sent to routers and not yet processed
+            self.flying = collections.Counter() # {payload: copies of it in flight}
+            self.pending = 0        # routers holding a triggered update in hold-down
+            self.messages = 0       # control packets sent
+            self.changes = 0        # route changes made by all tables
+            self.start = None       # time of the first control packet
+            self.last_event = time.time()
+
+    ## a router enqueued a control packet for another router
+    # periodic refreshes that carry nothing new are not reported
+    # @param data_S: its payload
+    def sent(self, data_S):
+        with self.lock:
+            now = time.time()
+            if(self.start is None):
+                self.start = now
+            self.in_flight += 1
+            self.flying[data_S] += 1
+            self.messages += 1
+            self.last_event = now
+
+    ## a router finished processing a control packet, ignored if it was never reported
+    # @param data_S: its payload
+    def received(self, data_S):
+        with self.lock:
+            if(self.flying.get(data_S, 0) <= 0):
+                return
+            self.flying[data_S] -= 1
+            self.in_flight -= 1
+            self.last_event = time.time()
+
+    ## a table changed routes to n destinations
+    def changed(self, n):
+        with self.lock:
+            self.changes += n
+            self.last_event = time.time()
+
+    ## a router started (1) or finished (-1) holding a triggered update
+    def holding(self, n):
+        with self.lock:
+            self.pending += n
+            self.last_event = time.time()
+
+    ## block until no control packet is in flight and no update is held back
+    # @param timeout: seconds to wait at most
+    # @return [convergence time in seconds or None on timeout, control packets sent]
+    def wait_converged(self, timeout):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self.lock:
+                quiet = (self.in_flight == 0) and (self.pending == 0) and \
+                    (time.time() - self.last_event >= self.quiet_time)
+                if(quiet):
+                    start = self.last_event if self.start is None else self.start
+                    return [self.last_event - start, self.messages]
+            time.sleep(0.005)
+        return [None, self.messages]
+
+
 ## Implements a multi-interface router
 class Router:
+    ## periodic updates are spread uniformly over +/- this fraction of refresh_interval
+    refresh_jitter = 0.25
+    ## weight of the newest queue depth sample in the smoothed load
+    load_weight = 0.25
+    ## queued packets (smoothed) per unit of extra link cost
+    load_step = 4
+    ## load cost only falls back once it is more than this many units too high
+    load_hysteresis = 1
+    ## least seconds between two load cost changes of one router, and how long
+    # an interface counts as carrying transit traffic after it last did
+    load_hold = 1.0
     
     ##@param name: friendly router name for debugging
     # @param cost_D: cost table to neighbors {neighbor: {interface: cost}}
     # @param max_queue_size: max queue length (passed to Interface)
-    def __init__(self, name, cost_D, max_queue_size):
+    # @param hold_down: seconds to coalesce routing changes before advertising them
+    # @param split_horizon: do not advertise routes back out the interface they use
+    # @param poison_reverse: with split_horizon, advertise those routes at infinity instead
+    # @param routing: 'dv' for distance vector, 'dv-dense' for distance vector over
+    #   array-backed storage, 'ls' for link state, 'server' to send our links to a
+    #   RouteServer attached on interface len(cost_D) and take routes from it
+    # @param ecmp: spread flows over equal-cost next hops by hashing (src, dst)
+    # @param monitor: ControlPlaneMonitor to report control traffic to, or None
+    # @param timers: shared TimerWheel driving periodic updates and route aging, or None
+    # @param refresh_interval: mean seconds between periodic updates (jittered)
+    # @param route_timeout: seconds without hearing a neighbor before its routes expire
+    # @param gc_time: seconds an expired route is advertised at infinity before it is dropped
+    # @param prefix_D: address prefixes attached to this router {'address/length': {interface: cost}}
+    # @param print_table: print the initial routing table (slow for big topologies)
+    # @param load_aware: add a cost for the smoothed output queue depth of each
+    #   link to another router and advertise it like any other cost change,
+    #   raised only for traffic that entered the network at this router
+    # @param load_interval: seconds between queue depth samples
+    # @param police_rate: data packets per second admitted on each policed interface, None for no limit
+    # @param police_burst: data packets admitted back to back before policing starts
+    # @param police_per_source: keep one bucket per (interface, source) instead of per interface
+    # @param police_intf: interfaces to police, None for those facing hosts; traffic from
+    #   other routers was already policed where it entered the network
+    # @param group_D: multicast groups with members behind this router {'*group': [interface, ...]}
+    # @param batch_size: forward up to this many packets at a time through a NumPy
+    #   copy of the FIB (needs numpy), None forwards them one by one
+    def __init__(self, name, cost_D, max_queue_size, hold_down=0.05,
+                 split_horizon=True, poison_reverse=True, routing='dv', ecmp=True,
+                 monitor=None, timers=None, refresh_interval=30, route_timeout=180, gc_time=120,
+                 prefix_D=None, print_table=True, load_aware=False, load_interval=0.1,
+                 police_rate=None, police_burst=10, police_per_source=False, group_D=None,
+                 batch_size=None, police_intf=None):
         self.stop = False #for thread termination
         self.name = name
-        #create a list of interfaces
-        self.intf_L = [Interface(max_queue_size) for _ in range(len(cost_D))]
+        #create a list of interfaces, plus one for the route server if we use one
+        self.server_intf = len(cost_D) if routing == 'server' else None
+        self.intf_L = [Interface(max_queue_size) for _ in range(len(cost_D) + (routing == 'server'))]
         #save neighbors and interfeces on which we connect to them
         self.cost_D = cost_D    # {neighbor: {interface: cost}}
-        self.table = RoutingTable(cost_D, name)
+        self.prefix_D = {} if prefix_D is None else prefix_D
+        self.group_D = {} if group_D is None else group_D
+        self.routing = routing
+        self.ecmp = ecmp
+        self.monitor = monitor
+        if(routing in ('ls', 'server')):
+            self.table = LinkStateTable(cost_D, name, self.prefix_D, routing == 'server')
+        elif(routing == 'dv'):
+            self.table = RoutingTable(cost_D, name, self.prefix_D)
+        elif(routing == 'dv-dense'):
+            self.table = DenseRoutingTable(cost_D, name, self.prefix_D)
+        else:
+            raise Exception('%s: unknown routing option: %s' % (name, routing))
         self.rt_tbl_D = {}      # {destination: {router: cost}}
+        self.hold_down = hold_down
+        self.update_due = None  # time the pending triggered update goes out
+        self.last_sent_D = {}   # {interface: last advertisement sent on it}
+        self.split_horizon = split_horizon
+        self.poison_reverse = poison_reverse
+        #interfaces leading to other routers, hosts do not take part in routing
+        self.router_intf_L = sorted(i for i in self.table.intfNeighbor if self.table.intfNeighbor[i][0] == 'R')
+        #interfaces leading to hosts, where broadcasts are delivered
+        self.host_intf_L = sorted(i for i in self.table.intfNeighbor if self.table.intfNeighbor[i][0] != 'R')
+        #interfaces our routing updates go out on
+        self.control_intf_L = self.router_intf_L if self.server_intf is None else [self.server_intf]
+        self.timers = timers
+        self.refresh_interval = refresh_interval
+        self.route_timeout = route_timeout
+        self.gc_time = gc_time
+        self.timer_events = collections.deque() # callbacks handed over by the timer wheel
+        self.control_Q = queue.Queue() # control packets handed from the data plane to the control plane
+        self.down_intf = set()  # interfaces marked down, forwarding falls back to the alternate
+        self.load_aware = load_aware
+        self.load_interval = load_interval
+        self.load_due = time.time() + load_interval
+        self.load_hold_until = 0 # no load cost changes before then
+        self.transit_D = {}     # {interface: last time it carried a packet from another router}
+        self.load_D = {}        # {interface: smoothed output queue depth}
+        self.load_cost_D = {}   # {interface: extra cost currently in the table}
+        self.police_rate = police_rate
+        self.police_burst = police_burst
+        self.police_per_source = police_per_source
+        self.police_intf = set(self.host_intf_L if police_intf is None else police_intf)
+        self.buckets = {}       # {interface or (interface, source): TokenBucket}
+        self.policed_D = {}     # {interface: data packets dropped by the policer}
+        self.batch_size = batch_size
+        self.array_fib = None   # batch_3.ArrayFIB of the current snapshot, built on first use
+        if(batch_size is not None):
+            import batch_3 #needs numpy, so only loaded when batching is asked for
+            self.forward_batch = batch_3.forward_batch
+        if(timers is not None):
+            self.table.collect = True
+            self.schedule_refresh()
         print('%s: Initialized routing table' % self)
-        self.print_routes2()
+        if(print_table):
+            self.print_routes2()
 ##        if(self.name == 'RA'):
 ##                print(self.cost_D)
     
@@ -176,35 +392,40 @@ class Router:
         self.print_routes2()
 
 
+    ## render the routing table, every cost is looked up once and the columns
+    # are sized to fit before the string is joined in one pass
     def print_routes2(self):
-        retS = '\n'
-        retS += self.name
-        retS += ":\n      "
-        for item in self.table.getDests():
-            retS += str(item) + "    "
-        retS += "\n"
-        for r in self.table.getRouters():
-            retS += str(r)
-            for d in self.table.getDests():
-                c = self.table.getCostOf(d, r)
-                if((c < 0) or (c > 9)):
-                    retS += "    "
-                else:
-                    retS += "     "
-                retS += str(c)
-                
-            retS += "\n"
-        
+        dests = [str(d) for d in self.table.getDests()]
+        routers = [str(r) for r in self.table.getRouters()]
+        cells = [[str(self.table.getCostOf(d, r)) for d in self.table.getDests()] for r in self.table.getRouters()]
+        label = max([len(r) for r in routers] + [2])
+        widths = [max([len(dests[j]) + 4, 6] + [len(row[j]) + 2 for row in cells]) for j in range(len(dests))]
+        lines = ['', self.name + ':', ' ' * label + ''.join(dests[j].rjust(widths[j]) for j in range(len(dests)))]
+        for r, row in zip(routers, cells):
+            lines.append(r.ljust(label) + ''.join(row[j].rjust(widths[j]) for j in range(len(row))))
+        retS = '\n'.join(lines) + '\n'
         print(retS)
         return retS
 
+    ## machine-readable copy of this router's routes
+    # @return {'router': name, 'routing': option, 'routes': {destination: {'interface', 'cost', 'via', 'hops'}}}
+    def snapshot(self):
+        routes = self.table.routes
+        multipath = self.table.publisher.current.multipath
+        routes_D = {}
+        for dest in routes:
+            intF, cost, via = routes[dest]
+            routes_D[str(dest)] = {'interface': intF, 'cost': cost, 'via': via,
+                                   'hops': list(multipath.get(dest, (intF,)))}
+        return {'router': self.name, 'routing': self.routing, 'routes': routes_D}
+
     ## called when printing the object
     def __str__(self):
         return self.name
 
 
-    ## look through the content of incoming interfaces and 
-    # process data and control packets
+    ## look through the content of incoming interfaces, forward data packets
+    # and hand control packets over to the control-plane thread
     def process_queues(self):
         for i in range(len(self.intf_L)):
             pkt_S = None
@@ -212,26 +433,100 @@ class Router:
             pkt_S = self.intf_L[i].get('in')
             #if packet exists make a forwarding decision
             if pkt_S is not None:
-                p = NetworkPacket.from_byte_S(pkt_S) #parse a packet out
-                if p.prot_S == 'data':
-                    self.forward_packet(p,i)
-                elif p.prot_S == 'control':
-                    self.update_routes(p, i)
-                else:
-                    raise Exception('%s: Unknown packet type in packet %s' % (self, p))
-            
+                if((self.police_rate is not None) and not self.police(pkt_S, i)):
+                    continue
+                self.handle_packet(pkt_S, i)
+
+
+    ## parse one packet and forward it or hand it to the control plane
+    #  @param pkt_S Packet as received
+    #  @param i Interface it arrived on
+    def handle_packet(self, pkt_S, i):
+        p = NetworkPacket.from_byte_S(pkt_S) #parse a packet out
+        if p.prot_S == 'data':
+            self.forward_packet(p,i)
+        elif p.prot_S == 'control':
+            self.control_Q.put((p, i))
+        else:
+            raise Exception('%s: Unknown packet type in packet %s' % (self, p))
+
+
+    ## batch fast path: take up to batch_size packets across the incoming
+    # interfaces (an equal share each, so none is starved) and forward them together
+    def process_batch(self):
+        share = max(1, self.batch_size // len(self.intf_L))
+        batch = []
+        for i in range(len(self.intf_L)):
+            for _ in range(share):
+                pkt_S = self.intf_L[i].get('in')
+                if pkt_S is None:
+                    break
+                if((self.police_rate is not None) and not self.police(pkt_S, i)):
+                    continue
+                batch.append([pkt_S, i])
+        if batch:
+            self.forward_batch(self, batch)
+
+
+    ## ingress policing, run on the raw packet before any parsing or lookup
+    # control packets are never policed so routing keeps working under overload;
+    # drops are only counted, printing each one would cost what policing saves
+    #  @param pkt_S Packet as received
+    #  @param i Interface it arrived on
+    #  @return True if the packet may be processed
+    def police(self, pkt_S, i):
+        if(i not in self.police_intf):
+            return True
+        n = NetworkPacket.dst_S_length
+        if(pkt_S[2 * n : 2 * n + NetworkPacket.prot_S_length] != '1'):
+            return True
+        key = (i, pkt_S[n : 2 * n]) if self.police_per_source else i
+        bucket = self.buckets.get(key)
+        if(bucket is None):
+            bucket = self.buckets[key] = TokenBucket(self.police_rate, self.police_burst)
+        if(bucket.take(time.time())):
+            return True
+        self.policed_D[i] = self.policed_D.get(i, 0) + 1
+        return False
+
 
     ## forward the packet according to the routing table
     #  @param p Packet to forward
     #  @param i Incoming interface number for packet p
     def forward_packet(self, p, i):
+        if(is_group(p.dst)):
+            self.forward_group(p, i)
+            return
         try:
-            # TODO: Here you will need to implement a lookup into the 
-            # forwarding table to find the appropriate outgoing interface
-            # for now we assume the outgoing interface is 1
+            #take the published snapshot once, every lookup below sees the same version
+            fib = self.table.publisher.current
             dest = p.dst
-            intF = self.table.getBestRoute(dest)
+            if(dest.isdigit()):
+                #numeric address: forward on the route of its longest matching prefix,
+                # one wider than addr_bits is no address of ours and has no route
+                dest = fib.lpm.lookup(int(dest)) if int(dest) < (1 << addr_bits) else None
+            hops = fib.multipath.get(dest) if self.ecmp else None
+            if(hops):
+                intF = hops[flow_hash(p.src, p.dst) % len(hops)]
+            else:
+                intF = fib.lookup(dest)
+            if(intF in self.down_intf):
+                #another live equal-cost hop first, then the primary, then the loop-free alternate
+                live = [h for h in (hops or ()) if h not in self.down_intf]
+                if(live):
+                    intF = live[flow_hash(p.src, p.dst) % len(live)]
+                else:
+                    intF = fib.lookup(dest)
+                    if(intF in self.down_intf):
+                        intF = fib.backup.get(dest)
+                        if(intF in self.down_intf):
+                            intF = None
+            if(intF is None):
+                print('%s: no route for packet "%s" from interface %d' % (self, p, i))
+                return
             self.intf_L[intF].put(p.to_byte_S(), 'out', True)
+            if(self.load_aware and (i in self.router_intf_L)):
+                self.transit_D[intF] = time.time()
             print('%s: forwarding packet "%s" from interface %d to %d' % \
                 (self, p, i, intF))
         except queue.Full:
@@ -239,18 +534,191 @@ class Router:
             pass
 
 
+    ## replicate a broadcast or multicast packet (reverse path broadcast)
+    # a copy is accepted only if it came in on our own primary route back to
+    # the source (never an ECMP alternative), so every router takes exactly
+    # one copy however many arrive;
+    # it then goes to every other router and to the hosts that want it
+    #  @param p Packet to forward
+    #  @param i Incoming interface number for packet p
+    def forward_group(self, p, i):
+        fib = self.table.publisher.current
+        if(i != fib.lookup(p.src)):
+            return #failed the reverse path check: a duplicate, or a source we cannot reach
+        if(p.dst == '*'):
+            members = self.host_intf_L
+        else:
+            members = self.group_D.get(p.dst, ())
+        out_L = [intf for intf in self.router_intf_L + list(members)
+                 if (intf != i) and (intf not in self.down_intf)]
+        pkt_S = p.to_byte_S() #encoded once, every copy shares the same immutable string
+        for intf in out_L:
+            try:
+                self.intf_L[intf].put(pkt_S, 'out', True)
+            except queue.Full:
+                print('%s: packet "%s" lost on interface %d' % (self, p, intf))
+        print('%s: replicating packet "%s" from interface %d to %s' % (self, p, i, out_L))
+
+
+    ## mark an interface down, packets routed over it take their loop-free alternate
+    # until routing converges around the failure
+    def interface_down(self, i):
+        self.down_intf.add(i)
+
+
+    ## mark an interface back up
+    def interface_up(self, i):
+        self.down_intf.discard(i)
+
+
     ## send out route update
     # @param i Interface number on which to send out a routing update
     def send_routes(self, i):
-        # TODO: Send out a routing table update
         #create a routing table update packet
-        p = NetworkPacket(0, '-1', 'control', str(self.table))
+        routes_S = self.advertisement(i)
+        #repeating the last advertisement is only a refresh, it changes no route
+        if(self.send_control(i, routes_S, not same_routes(routes_S, self.last_sent_D.get(i)))):
+            self.last_sent_D[i] = routes_S
+
+
+    ## send a control packet
+    # @param i Interface number to send it on
+    # @param data_S Control payload
+    # @param report False for a refresh the monitor should not wait for
+    # @return True if the packet was enqueued
+    def send_control(self, i, data_S, report=True):
+        p = NetworkPacket(0, '-1', 'control', data_S)
         try:
             #print('%s: sending routing update "%s" from interface %d' % (self, p, i))
             self.intf_L[i].put(p.to_byte_S(), 'out', True)
+            if(report and (self.monitor is not None) and (i in self.control_intf_L)):
+                self.monitor.sent(data_S)
+            return True
         except queue.Full:
             print('%s: packet "%s" lost on interface %d' % (self, p, i))
-            pass
+            return False
+
+
+    ## send the same control payload on several interfaces
+    # the packet is encoded once and the string shared by every copy
+    # @param intf_L Interfaces to send it on
+    # @param data_S Control payload
+    # @param report False for a refresh the monitor should not wait for
+    def flood_control(self, intf_L, data_S, report=True):
+        pkt_S = NetworkPacket(0, '-1', 'control', data_S).to_byte_S()
+        for i in intf_L:
+            try:
+                self.intf_L[i].put(pkt_S, 'out', True)
+                if(report and (self.monitor is not None) and (i in self.control_intf_L)):
+                    self.monitor.sent(data_S)
+            except queue.Full:
+                print('%s: packet "%s" lost on interface %d' % (self, pkt_S, i))
+
+
+    ## routing advertisement for interface i, filtered by split horizon / poison reverse
+    def advertisement(self, i):
+        if(self.split_horizon):
+            return self.table.toStr(i, self.poison_reverse)
+        return self.table.toStr()
+
+
+    ## schedule a triggered update, changes within the hold-down window go out together
+    def schedule_routes(self):
+        if(self.update_due is None):
+            self.update_due = time.time() + self.hold_down
+            if(self.monitor is not None):
+                self.monitor.holding(1)
+
+
+    ## once the hold-down expires send one update per neighboring router,
+    # skipping interfaces whose last advertisement is identical
+    def flush_routes(self):
+        if((self.update_due is None) or (time.time() < self.update_due)):
+            return
+        self.update_due = None
+        for intf in self.control_intf_L:
+            if(self.last_sent_D.get(intf) != self.advertisement(intf)):
+                self.send_routes(intf)
+        if(self.monitor is not None):
+            self.monitor.holding(-1)
+
+
+    ## arm the next periodic update, jittered so routers do not synchronize
+    def schedule_refresh(self):
+        delay = self.refresh_interval * random.uniform(1 - self.refresh_jitter, 1 + self.refresh_jitter)
+        self.timers.schedule(delay, lambda: self.timer_events.append(self.refresh_routes))
+
+
+    ## periodic update: age out stale routes and re-advertise the whole table
+    def refresh_routes(self):
+        changed = self.table.expireRoutes(time.time(), self.route_timeout, self.gc_time)
+        if(changed and (self.monitor is not None)):
+            self.monitor.changed(len(changed))
+        if(self.routing in ('ls', 'server')):
+            self.table.refreshLSA()
+        for intf in self.control_intf_L:
+            self.send_routes(intf)
+        self.schedule_refresh()
+
+
+    ## run callbacks the timer wheel handed to this router, on the control-plane thread
+    def process_timers(self):
+        while self.timer_events:
+            self.timer_events.popleft()()
+
+
+    ## sample output queue depths and turn them into link costs
+    # costs rise as soon as the smoothed load calls for it but fall back only
+    # past the hysteresis band, so routes do not flap between two paths.
+    # Only the router where traffic enters the network raises a cost: a
+    # router further down would often find its alternative leads straight
+    # back upstream and bounce the packets still on their way (a microloop)
+    def sample_load(self):
+        now = time.time()
+        if(now < self.load_due):
+            return
+        self.load_due = now + self.load_interval
+        changed = []
+        for i in self.router_intf_L:
+            n = self.table.intfNeighbor[i]
+            if(self.table.intF_Of(n) != i):
+                continue #only the interface routes use carries the neighbor's cost
+            depth = self.intf_L[i].out_queue.qsize()
+            load = self.load_D.get(i, 0.0) * (1 - self.load_weight) + depth * self.load_weight
+            self.load_D[i] = load
+            target = int(load / self.load_step)
+            current = self.load_cost_D.get(i, 0)
+            if(now < self.load_hold_until):
+                continue #our last change is still settling, keep smoothing only
+            if(target > current):
+                if(now - self.transit_D.get(i, 0) < self.load_hold):
+                    continue #transit traffic, left to the router it entered at
+            elif(target >= current - self.load_hysteresis):
+                continue
+            self.load_cost_D[i] = target
+            self.load_hold_until = now + self.load_hold
+            cost = min(self.cost_D[n][i] + target, self.table.infinity - 1)
+            changed += self.table.setLinkCost(n, cost)
+            self.schedule_routes()
+        if(changed and (self.monitor is not None)):
+            self.monitor.changed(len(changed))
+
+
+    ## process the control packets the data plane handed over
+    # @param timeout: seconds to wait for the first one
+    def process_control(self, timeout):
+        try:
+            p, i = self.control_Q.get(True, timeout)
+        except queue.Empty:
+            return
+        while True:
+            self.update_routes(p, i)
+            if(self.monitor is not None):
+                self.monitor.received(p.data_S)
+            try:
+                p, i = self.control_Q.get_nowait()
+            except queue.Empty:
+                return
 
 
     ## forward the packet according to the routing table
@@ -258,50 +726,242 @@ class Router:
     def update_routes(self, p, i):
         #TODO: add logic to update the routing tables and
         # possibly send out routing updates
-        boolean = self.table.updateTable(i, p.data_S)
+        if(self.routing == 'ls'):
+            self.update_lsdb(p, i)
+            return
+        if(self.routing == 'server'):
+            self.update_from_server(p, i)
+            return
+        changed = self.table.updateTable(i, p.data_S)
         print('%s: Received routing update %s from interface %d' % (self, p, i))
         #print(self.print_routes2())
-        if(boolean == True):
-##            if(self.name == 'RA'):
-##                print(self.cost_D)
-            for intf in range(len(self.intf_L)):
-                #if(intf != i):
-                self.send_routes(intf)
+        if(changed):
+            if(self.monitor is not None):
+                self.monitor.changed(len(changed))
+            self.schedule_routes()
+
+
+    ## link state: install an LSA and flood it on if it is new
+    # the first new LSA also makes this router flood its own LSA
+    #  @param p Packet containing the LSA
+    #  @param i Interface it arrived on
+    def update_lsdb(self, p, i):
+        refresh = self.table.isRefresh(p.data_S)
+        changed = self.table.installLSA(p.data_S)
+        print('%s: Received link-state update %s from interface %d' % (self, p, i))
+        if(changed is None):
+            return
+        if(changed and (self.monitor is not None)):
+            self.monitor.changed(len(changed))
+        self.flood_control([intf for intf in self.router_intf_L if intf != i], p.data_S, not refresh)
+        self.schedule_routes()
+
+
+    ## route server mode: install the route changes the server pushed
+    #  @param p Packet containing the changes
+    #  @param i Interface it arrived on
+    def update_from_server(self, p, i):
+        if(i != self.server_intf):
+            return #neighbors do not exchange routes in this mode
+        changed = self.table.applyDelta(p.data_S)
+        print('%s: Received routes from server %s on interface %d' % (self, p, i))
+        if(changed and (self.monitor is not None)):
+            self.monitor.changed(len(changed))
 
                 
-    ## thread target for the host to keep forwarding data
+    ## thread target for the control plane: route computation, timers and
+    # triggered updates, publishing a new FIB for the data plane each time
+    def run_control(self):
+        print (threading.currentThread().getName() + ': Starting')
+        while True:
+            self.process_control(0.005)
+            self.process_timers()
+            if(self.load_aware):
+                self.sample_load()
+            self.flush_routes()
+            if self.stop:
+                print (threading.currentThread().getName() + ': Ending')
+                return
+
+
+    ## thread target for the router to keep forwarding data
+    # the control plane runs on its own thread so table updates never hold up forwarding
     def run(self):
         print (threading.currentThread().getName() + ': Starting')
+        control = threading.Thread(name='%s-control' % self.name, target=self.run_control)
+        control.start()
         while True:
-            self.process_queues()
+            if(self.batch_size is None):
+                self.process_queues()
+            else:
+                self.process_batch()
             if self.stop:
+                control.join()
                 print (threading.currentThread().getName() + ': Ending')
                 return
 
 
+## Route server (route reflector)
+# Every router sends its LSA to the server over one link instead of flooding
+# it, the server runs an incrementally repaired shortest path tree per router
+# and sends each router only the routes that changed for it. Control traffic
+# is then two messages per change and router rather than a flood across the
+# whole network.
+class RouteServer:
+    ## advertised cost meaning "unreachable"
+    infinity = 64
+
+    ##@param name: friendly name for debugging
+    # @param clients: {interface: router} routers attached to the server
+    # @param max_queue_size: max queue length (passed to Interface)
+    # @param hold_down: seconds to coalesce LSAs before pushing route changes
+    # @param monitor: ControlPlaneMonitor to report control traffic to, or None
+    def __init__(self, name, clients, max_queue_size, hold_down=0.05, monitor=None):
+        self.stop = False #for thread termination
+        self.name = name
+        self.clients = clients
+        self.clientIntf = {clients[i]: i for i in clients}
+        self.intf_L = [Interface(max_queue_size) for _ in range(max(clients) + 1)]
+        self.hold_down = hold_down
+        self.monitor = monitor
+        self.lsdb = {}      # {router: [seq, {neighbor: cost}]}
+        self.graph = {}     # {router: {neighbor: cost}} from the current LSAs
+        self.trees = {}     # {client: ShortestPathTree rooted at it}
+        self.dirty = {}     # {client: nodes whose route may have changed}
+        self.update_due = None
+
+    ## called when printing the object
+    def __str__(self):
+        return self.name
+
+    ## install an LSA and repair every client's tree
+    def install(self, data_S):
+        name, seq, edges = LinkStateTable.fromStr(data_S)
+        old = self.lsdb.get(name)
+        if((old is not None) and (old[0] >= seq)):
+            return
+        self.lsdb[name] = [seq, edges]
+        self.graph[name] = edges
+        for r in self.trees:
+            self.dirty[r] |= self.trees[r].setEdges(name, edges)
+        if((name in self.clientIntf) and (name not in self.trees)):
+            self.trees[name] = ShortestPathTree(name, self.graph)
+            self.dirty[name] = set(self.trees[name].dist)
+        if(self.update_due is None):
+            self.update_due = time.time() + self.hold_down
+            if(self.monitor is not None):
+                self.monitor.holding(1)
+
+    ## route changes for one client as 'SERVER;dest:via:cost;...'
+    # a cost of infinity withdraws the route
+    def delta(self, r):
+        tree = self.trees[r]
+        retS = str(self.name) + ';'
+        for dest in sorted(self.dirty[r]):
+            if(dest == r):
+                continue
+            if(dest in tree.dist):
+                retS += '%s:%s:%d;' % (dest, tree.firsthop[dest], tree.dist[dest])
+            else:
+                retS += '%s:-:%d;' % (dest, self.infinity)
+        return retS
+
+    ## once the hold-down expires push each client the routes that changed for it
+    def flush(self):
+        if((self.update_due is None) or (time.time() < self.update_due)):
+            return
+        self.update_due = None
+        for r in self.trees:
+            if(self.dirty[r] - {r}):
+                p = NetworkPacket(0, '-1', 'control', self.delta(r))
+                self.intf_L[self.clientIntf[r]].put(p.to_byte_S(), 'out', True)
+                if(self.monitor is not None):
+                    self.monitor.sent(p.data_S)
+            self.dirty[r] = set()
+        if(self.monitor is not None):
+            self.monitor.holding(-1)
+
+    ## thread target for the server
+    def run(self):
+        print (threading.currentThread().getName() + ': Starting')
+        while True:
+            for i in range(len(self.intf_L)):
+                pkt_S = self.intf_L[i].get('in')
+                if pkt_S is not None:
+                    p = NetworkPacket.from_byte_S(pkt_S)
+                    if p.prot_S == 'control':
+                        self.install(p.data_S)
+                        if(self.monitor is not None):
+                            self.monitor.received(p.data_S)
+            self.flush()
+            if self.stop:
+                print (threading.currentThread().getName() + ': Ending')
+                return
+
+
+## Distance-vector routing table
+# Keeps the last distance vector advertised by each neighbor and runs
+# Bellman-Ford incrementally: an update only recomputes the destinations
+# whose advertised cost changed.
 class RoutingTable:
+    ## advertised cost meaning "unreachable"
+    infinity = 64
     
-    def __init__(self, cost_D, name):
+    ##@param cost_D: cost table to neighbors {neighbor: {interface: cost}}
+    # @param name: name of the router owning this table
+    # @param prefix_D: attached address prefixes {'address/length': {interface: cost}}
+    def __init__(self, cost_D, name, prefix_D=None):
         self.name = name
         self.costD = cost_D
-        self.costDicts = {self.name: self.costD}
-        self.reachable = []
+        self.links = {}         # {neighbor: [interface, cost]} cheapest interface to each neighbor
+        self.intfNeighbor = {}  # {interface: neighbor}
+        self.vectors = {}       # {neighbor router: {destination: cost}} as last advertised
+        self.routes = {}        # {destination: [interface, cost, via]} current best routes
+        self.hops = {}          # {destination: (interface, ...)} when several next hops tie
+        self.heard = {}         # {neighbor: time its last vector arrived}
+        self.garbage = {}       # {destination: [interface, time it is dropped]} lost routes still advertised
+        self.collect = False    # keep lost routes in garbage (set when route aging runs)
+        self.costDicts = {self.name: {}} # {router: {destination: {interface: cost}}}, -1 until known
+        self.version = 0        # bumped whenever costDicts changes
+        self.costCache = {}     # {(dest, router): (version, cost)} memo for getCostOf
         self.routers = []
         self.dests = []
         self.routers.append(self.name)
         self.dests.append(self.name)
-        self.reachable.append(self.name)
         for key in cost_D:
+            intF = min(cost_D[key], key=lambda i: (cost_D[key][i], i))
+            self.links[key] = [intF, cost_D[key][intF]]
+            for i in cost_D[key]:
+                self.intfNeighbor[i] = key
             self.dests.append(key)
-            self.reachable.append(key)
             if(key[0] == 'R'):
                 self.routers.append(key)
                 self.costDicts[key] = -1
+        #attached prefixes are reached like neighbors that never send a vector
+        for key in (prefix_D or {}):
+            intF = min(prefix_D[key], key=lambda i: (prefix_D[key][i], i))
+            self.links[key] = [intF, prefix_D[key][intF]]
+            self.dests.append(key)
+        for key in self.links:
+            self.recompute(key)
+        self.publisher = FIBPublisher()  # read-only forwarding snapshots for the data plane
+        self.compileFIB()
 
     def bestPath(self, dest):
         return -1 #out interface 
 
+    ## cost from router to dest as seen in costDicts, memoized until costDicts changes
     def getCostOf(self, dest, router):
+        key = (dest, router)
+        hit = self.costCache.get(key)
+        if((hit is not None) and (hit[0] == self.version)):
+            return hit[1]
+        version = self.version
+        c = self.costOf(dest, router)
+        self.costCache[key] = (version, c)
+        return c
+
+    def costOf(self, dest, router):
         if(dest == router):
             return 0
         if(router in self.costDicts.keys()):
@@ -316,20 +976,52 @@ class RoutingTable:
                                 minVal = intFaces[intF]
                             else:
                                 minVal = intFaces[intF] if intFaces[intF] < minVal else minVal           
-                return -1 if minVal == None else minVal #cost
+                return -1 if ((minVal == None) or (minVal >= self.infinity)) else minVal #cost
             else: #do not yet know connections for this router
                 return -1
 
         else:
             return (self.getCostOf(router, self.name) + self.getCostOf(dest, self.name))
 
+    ## forwarding lookup, a single dict probe into the compiled FIB
+    # @param dest: destination name
+    # @return outgoing interface, or None if there is no route
     def getBestRoute(self, dest):
-        dv = self.DVother(dest, self.name)
-        intF = self.intF_Of(dv[0])
-        if(self.name == "RD"):
-            print("", end='')
-            print("DV Best Path: Fwd pkt's from " + str(self.name) + " to " + str(dest) + " along interface " + str(intF))
-        return intF #interface
+        return self.publisher.current.lookup(dest) #interface
+
+    ## compile the {destination: interface} forwarding table from the routing state
+    # and publish it as a new read-only snapshot; called whenever updateTable
+    # changes something, so forwarding never runs DV
+    def compileFIB(self):
+        self.publisher.publish({dest: self.routes[dest][0] for dest in self.routes}, dict(self.hops),
+                               self.alternates())
+
+    ## loop-free alternate interface of every destination that has one
+    # poison reverse advertises routes through us at infinity, so only
+    # neighbors with a path of their own ever qualify
+    # @return {destination: interface}
+    def alternates(self):
+        backup = {}
+        for dest in self.routes:
+            intF, cost, via = self.routes[dest]
+            candidates = []
+            for n in self.links:
+                vector = self.vectors.get(n)
+                if(n == dest):
+                    to_dest = 0
+                elif(vector is None):
+                    continue
+                else:
+                    to_dest = vector.get(dest, self.infinity)
+                to_us = self.infinity if vector is None else vector.get(self.name, self.infinity)
+                if(to_us >= self.infinity):
+                    to_us = self.links[n][1]
+                if(to_dest < self.infinity):
+                    candidates.append([to_dest, to_us, self.costD.get(n, {self.links[n][0]: self.links[n][1]})])
+            alt = loop_free_alternate(intF, cost, candidates)
+            if(alt is not None):
+                backup[dest] = alt
+        return backup
 
     def getRouters(self):
         return self.routers
@@ -340,127 +1032,175 @@ class RoutingTable:
     def getCosts(self):
         return []
 
+    ## install a distance vector received from a neighbor
+    # @param intF_in: interface the update arrived on
+    # @param dataIn: the neighbor's table as produced by toStr
+    # @return list of destinations whose route changed (empty if none)
     def updateTable(self, intF_in, dataIn):
-        changed = False
-        thisDict = self.costDicts[self.name]
-        r = None
-        rIn = None
-        for key in thisDict:
-            if(r != None):
-                break
-            elif(key in thisDict.keys()):
-                paths = thisDict[key]
-                for intF in paths:
-                    if(int(intF) == int(intF_in)):
-                        r = key
-
-        self.costDicts[r] = RoutingTable.fromStr(dataIn)
-
-        rTable = self.costDicts[r]
-        for key in rTable:
-            if(key not in thisDict.keys()):
-                if(key == self.name):
-                    continue
-                thisDict[key] = {intF_in: (int(self.getCostOf(r, self.name)) + int(self.getCostOf(key, r)))}
-                self.costDicts[self.name] = thisDict
-                self.dests.append(key)
-                changed = True
-            else:
-                #print("\nDV: ")
-                dv = self.DV(key)
-                path = dv[0]
-                cost = dv[1]
-                #print("In table for router:" +  str(self.name))
-                #print(path, end='')
-                #print("-->", end='')
-                #print(key)
-                #print("This route costs: " + str(cost))
-                #print()
-                if(path == self.name):
-                    #print("\nInUpdate:Nothing changed")
-                    continue
-                else:
-                    changed = False
-                    #print("InUpdate:whatDo?NothingChangedButItShouldHave")
-                    this = thisDict[key]
+        r = self.intfNeighbor.get(int(intF_in))
+        if(r is None):
+            return []
+        rTable = RoutingTable.fromStr(dataIn)
+        vector = {}
+        for dest in rTable:
+            vector[dest] = min(rTable[dest].values())
+        old = self.vectors.get(r, {})
+        self.heard[r] = time.time()
+        if(self.costDicts.get(r) != rTable):
+            self.costDicts[r] = rTable
+            self.version += 1
+        self.vectors[r] = vector
+        changed = []
+        for dest in set(old) | set(vector):
+            if((dest == self.name) or (old.get(dest) == vector.get(dest))):
+                continue
+            if(dest not in self.dests):
+                self.dests.append(dest)
+            if(self.recompute(dest)):
+                changed.append(dest)
+        if(changed or (vector != old)):
+            #alternates depend on every neighbor's vector, not only the routes
+            self.compileFIB()
         return changed
 
+    ## replace the routes with ones computed elsewhere (e.g. route_matrix_3)
+    # neighbor vectors are left alone, later updates only touch what they change
+    # @param routes: {destination: [interface, cost, via]}
+    def loadRoutes(self, routes):
+        this = {}
+        for dest in routes:
+            if(dest not in self.dests):
+                self.dests.append(dest)
+            this[dest] = {routes[dest][0]: routes[dest][1]}
+        self.routes = {dest: list(routes[dest]) for dest in routes}
+        self.hops = {}
+        self.costDicts[self.name] = this
+        self.version += 1
+        self.compileFIB()
+
+    ## interface used to reach a directly connected neighbor
     def intF_Of(self, node):
-        this = self.costDicts[self.name]
-        if(node in this.keys()):
-            i = 0
-            key = None
-            while(key == None):
-                if(i in this[node].keys()):
-                    key = i
-                    return i
-                i += 1
-        else:
-            return -1
+        if(node in self.links):
+            return self.links[node][0]
+        return -1
 
+    ## Bellman-Ford step for one destination over the neighbors' vectors
+    # @return [via, cost] of the best route, [-1, -1] if unreachable
     def DV(self, dest):
-        thisDict = self.costDicts[self.name]
         via = None
         cost = None
-        for path in self.reachable:
-            if(via == None):
-                via = path
-                
-            if(path == dest):
-                c = 0
-                dv = self.getCostOf(dest, self.name)
+        for n in self.links:
+            if(n == dest):
+                dv = 0
+            elif(n in self.vectors):
+                dv = self.vectors[n].get(dest, self.infinity)
             else:
-                c = self.getCostOf(path, self.name)
-                dv = self.getCostOf(dest, path)
-
-            if(cost == None):
-                cost = c + dv
-                via = path
-            elif((c + dv) < cost):
-                cost = c + dv
-                via = path
-                
+                continue
+            c = self.links[n][1] + dv
+            if(c >= self.infinity):
+                continue
+            if((cost == None) or (c < cost)):
+                cost = c
+                via = n
         return [via, cost] if ((via != None) and (cost != None)) else [-1, -1] #path and cost taken to dest
 
-
-    def DVother(self, dest, router):
-        thisDict = self.costDicts[router]
-        #print("DV: ", end='')
-        #print("For:" + str(router) + "-->" + str(dest) + "\nDict: ")
-        #print(thisDict)
-        if(isinstance(thisDict, int)):
-            return [-1, -1]
-        via = None
-        cost = None
-        for path in thisDict.keys():
-            if(via == None):
-                via = path
-                
-            if(path == dest):
-                c = 0
-                dv = self.getCostOf(dest, router)
+    ## interfaces of every neighbor reaching dest at the given cost
+    # @return sorted tuple of interfaces, empty unless there is more than one
+    def equalCostHops(self, dest, cost):
+        hops = set()
+        for n in self.links:
+            if(n == dest):
+                dv = 0
+            elif(n in self.vectors):
+                dv = self.vectors[n].get(dest, self.infinity)
             else:
-                c = self.getCostOf(path, router)
-                dv = self.getCostOf(dest, path)
-
-            if(cost == None):
-                cost = c + dv
-                via = path
-            elif((c + dv) < cost):
-                cost = c + dv
-                via = path
-
-            if(self.name == "RD"):
-                #print("Out via current path: " + str(path) + ", cost: " + str(c+dv))
-                print("", end="")
-        #print("DV results: out to: " + str(via) + ", with cost of: " + str(cost))
-        return [via, cost] if ((via != None) and (cost != None)) else [-1, -1] #path and cost taken to dest
+                continue
+            if(self.links[n][1] + dv == cost):
+                hops.add(self.links[n][0])
+        return tuple(sorted(hops)) if len(hops) > 1 else ()
+
+    ## recompute the route to dest and store it if it changed
+    # @return True if the route or its set of equal-cost next hops changed
+    def recompute(self, dest):
+        via, cost = self.DV(dest)
+        route = None if via == -1 else [self.links[via][0], cost, via]
+        hops = () if route is None else self.equalCostHops(dest, cost)
+        if((route == self.routes.get(dest)) and (hops == self.hops.get(dest, ()))):
+            return False
+        if(hops):
+            self.hops[dest] = hops
+        else:
+            self.hops.pop(dest, None)
+        if(route == self.routes.get(dest)):
+            return True
+        this = self.costDicts[self.name]
+        if(route is None):
+            if(self.collect):
+                self.garbage[dest] = [self.routes[dest][0], None]
+            del self.routes[dest]
+            del this[dest]
+        else:
+            self.garbage.pop(dest, None)
+            self.routes[dest] = route
+            this[dest] = {route[0]: route[1]}
+        self.version += 1
+        return True
+
+    ## age out routes: a neighbor not heard from within timeout has its vector
+    # withdrawn, and routes lost that way are advertised at infinity for gc
+    # seconds (garbage collection) before they are forgotten
+    # @param now: current time
+    # @param timeout: seconds a neighbor's vector stays valid
+    # @param gc: seconds a lost route stays in garbage
+    # @return list of destinations whose route changed
+    def expireRoutes(self, now, timeout, gc):
+        changed = []
+        expired = False
+        for n in list(self.heard):
+            if(now - self.heard[n] < timeout):
+                continue
+            del self.heard[n]
+            expired = True
+            old = self.vectors.pop(n, {})
+            self.costDicts[n] = -1
+            self.version += 1
+            for dest in old:
+                #recompute even if done earlier in this pass: the route may
+                # have moved onto a neighbor that expires later in it
+                if((dest != self.name) and self.recompute(dest) and (dest not in changed)):
+                    changed.append(dest)
+        for dest in list(self.garbage):
+            if(self.garbage[dest][1] is None):
+                self.garbage[dest][1] = now + gc
+            elif(self.garbage[dest][1] <= now):
+                del self.garbage[dest]
+        if(changed or expired):
+            #alternates depend on every neighbor's vector, not only the routes
+            self.compileFIB()
+        return changed
+
+    ## change the cost of the link to a neighbor, e.g. as its load changes
+    # @param neighbor: directly connected neighbor
+    # @param cost: new cost of the link (its interface stays the same)
+    # @return list of destinations whose route changed
+    def setLinkCost(self, neighbor, cost):
+        if(self.links[neighbor][1] == cost):
+            return []
+        self.links[neighbor][1] = cost
+        self.version += 1
+        changed = [dest for dest in list(self.dests) if (dest != self.name) and self.recompute(dest)]
+        self.compileFIB()
+        return changed
         
 
     def __str__(self):
         return self.toStr()
     
-    def toStr(self):
+    ## serialize the table as a routing advertisement
+    # @param outIntF: interface the advertisement goes out on; routes learned through it
+    #   are left out (split horizon) or sent at infinity (poison reverse). None sends all
+    # @param poison: use poison reverse rather than plain split horizon
+    def toStr(self, outIntF=None, poison=True):
         retS = ''
         retS += str(self.name)
         retS += ';'
@@ -472,13 +1212,19 @@ class RoutingTable:
             if(isinstance(connection, int)):
                 retS += "DNE"
                 continue
-            retS += str(connection) + ':'
             intF = this[connection]
             if(isinstance(intF, int)):
-                retS += "DNE"
+                retS += str(connection) + ':' + "DNE"
                 continue
+            if(outIntF in intF):
+                if(poison):
+                    retS += str(connection) + ':' + str(outIntF) + ':' + str(self.infinity) + ';'
+                continue
+            retS += str(connection) + ':'
             for key in intF:
                 retS += str(key) + ':' + str(intF[key]) + ';'
+        for dest in list(self.garbage):
+            retS += str(dest) + ':' + str(self.garbage[dest][0]) + ':' + str(self.infinity) + ';'
         return retS
 
     @classmethod
@@ -503,3 +1249,295 @@ class RoutingTable:
             cost = e[2]
             dictionary[dest] = {int(intF):int(cost)}
         return dictionary #return other.costDicts[other.name]   
+
+
+## Distance-vector routing table with dense, array-backed storage
+# Nodes are mapped to indices; our costs, next-hop interfaces and the vector
+# of each neighbor are flat arrays indexed by node, so memory and lookups stay
+# small with hundreds of destinations. Runs the same incremental Bellman-Ford
+# as RoutingTable and speaks the same advertisement format.
+class DenseRoutingTable(RoutingTable):
+
+    ##@param cost_D: cost table to neighbors {neighbor: {interface: cost}}
+    # @param name: name of the router owning this table
+    # @param prefix_D: attached address prefixes {'address/length': {interface: cost}}
+    def __init__(self, cost_D, name, prefix_D=None):
+        self.name = name
+        self.costD = cost_D
+        self.nodes = []                 # index -> node name
+        self.index = {}                 # node name -> index
+        self.cost = array('i')          # our cost to each node, infinity if unreachable
+        self.nexthop = array('h')       # outgoing interface to each node, -1 if none
+        self.via = array('h')           # position in self.neighbors of the next hop, -1 if none
+        self.neighbors = []             # neighbor names
+        self.nbrPos = {}                # neighbor name -> position in self.neighbors
+        self.nbrNode = array('i')       # node index of each neighbor
+        self.nbrIntf = array('h')       # cheapest interface to each neighbor
+        self.nbrCost = array('i')       # cost of that interface
+        self.vectors = []               # each neighbor's advertised costs by node index, None until known
+        self.hops = {}                  # {node index: (interface, ...)} when several next hops tie
+        self.heard = {}                 # {neighbor position: time its last vector arrived}
+        self.garbage = {}               # {node index: [interface, time it is dropped]} lost routes still advertised
+        self.collect = False
+        self.links = {}                 # {neighbor: [interface, cost]}
+        self.intfNeighbor = {}          # {interface: neighbor}
+        self.routers = [self.name]
+        self.routerSet = {self.name}
+        self.version = 0
+        self.costCache = {}
+        self.addNode(self.name)
+        self.cost[0] = 0
+        for key in cost_D:
+            intF = min(cost_D[key], key=lambda i: (cost_D[key][i], i))
+            self.links[key] = [intF, cost_D[key][intF]]
+            for i in cost_D[key]:
+                self.intfNeighbor[i] = key
+            self.nbrPos[key] = len(self.neighbors)
+            self.neighbors.append(key)
+            self.nbrNode.append(self.addNode(key))
+            self.nbrIntf.append(intF)
+            self.nbrCost.append(cost_D[key][intF])
+            self.vectors.append(None)
+            if(key[0] == 'R'):
+                self.routers.append(key)
+                self.routerSet.add(key)
+        for key in (prefix_D or {}):
+            intF = min(prefix_D[key], key=lambda i: (prefix_D[key][i], i))
+            self.links[key] = [intF, prefix_D[key][intF]]
+            self.nbrPos[key] = len(self.neighbors)
+            self.neighbors.append(key)
+            self.nbrNode.append(self.addNode(key))
+            self.nbrIntf.append(intF)
+            self.nbrCost.append(prefix_D[key][intF])
+            self.vectors.append(None)
+        for k in range(len(self.neighbors)):
+            self.recompute(self.nbrNode[k])
+        self.publisher = FIBPublisher()
+        self.compileFIB()
+
+    ## index of a node, adding it (unreachable) if it is new
+    def addNode(self, node):
+        i = self.index.get(node)
+        if(i is not None):
+            return i
+        i = len(self.nodes)
+        self.nodes.append(node)
+        self.index[node] = i
+        self.cost.append(self.infinity)
+        self.nexthop.append(-1)
+        self.via.append(-1)
+        for v in self.vectors:
+            if(v is not None):
+                v.append(self.infinity)
+        return i
+
+    ## current routes as {destination: [interface, cost, via]}, built on demand
+    @property
+    def routes(self):
+        routes = {}
+        for i in range(len(self.nodes)):
+            if(self.nexthop[i] >= 0):
+                routes[self.nodes[i]] = [self.nexthop[i], self.cost[i], self.neighbors[self.via[i]]]
+        return routes
+
+    def getDests(self):
+        return self.nodes
+
+    def costOf(self, dest, router):
+        if(dest == router):
+            return 0
+        i = self.index.get(dest)
+        if(i is None):
+            return -1
+        if(router == self.name):
+            c = self.cost[i]
+        elif((router in self.nbrPos) and (self.vectors[self.nbrPos[router]] is not None)):
+            c = self.vectors[self.nbrPos[router]][i]
+        else:
+            return -1
+        return -1 if c >= self.infinity else c
+
+    def compileFIB(self):
+        self.publisher.publish({self.nodes[i]: self.nexthop[i] for i in range(len(self.nodes)) if self.nexthop[i] >= 0},
+                               {self.nodes[i]: self.hops[i] for i in self.hops},
+                               self.alternates())
+
+    def alternates(self):
+        backup = {}
+        for i in range(1, len(self.nodes)):
+            if(self.nexthop[i] < 0):
+                continue
+            candidates = []
+            for k in range(len(self.neighbors)):
+                vector = self.vectors[k]
+                if(self.nbrNode[k] == i):
+                    to_dest = 0
+                elif(vector is None):
+                    continue
+                else:
+                    to_dest = vector[i]
+                #node 0 is this router
+                to_us = self.infinity if vector is None else vector[0]
+                if(to_us >= self.infinity):
+                    to_us = self.nbrCost[k]
+                if(to_dest < self.infinity):
+                    n = self.neighbors[k]
+                    candidates.append([to_dest, to_us, self.costD.get(n, {self.nbrIntf[k]: self.nbrCost[k]})])
+            alt = loop_free_alternate(self.nexthop[i], self.cost[i], candidates)
+            if(alt is not None):
+                backup[self.nodes[i]] = alt
+        return backup
+
+    ## install a distance vector received from a neighbor
+    # @param intF_in: interface the update arrived on
+    # @param dataIn: the neighbor's table as produced by toStr
+    # @return list of destinations whose route changed (empty if none)
+    def updateTable(self, intF_in, dataIn):
+        r = self.intfNeighbor.get(int(intF_in))
+        if((r is None) or (r not in self.routerSet)):
+            return []
+        rTable = RoutingTable.fromStr(dataIn)
+        for dest in rTable:
+            self.addNode(dest)
+        k = self.nbrPos[r]
+        self.heard[k] = time.time()
+        old = self.vectors[k]
+        if(old is None):
+            old = array('i', [self.infinity]) * len(self.nodes)
+        vector = array('i', [self.infinity]) * len(self.nodes)
+        for dest in rTable:
+            vector[self.index[dest]] = min(min(rTable[dest].values()), self.infinity)
+        self.vectors[k] = vector
+        changed = []
+        for i in range(1, len(self.nodes)):
+            if((vector[i] != old[i]) and self.recompute(i)):
+                changed.append(self.nodes[i])
+        if(vector != old):
+            self.version += 1
+        if(changed or (vector != old)):
+            self.compileFIB()
+        return changed
+
+    ## replace the routes with ones computed elsewhere (e.g. route_matrix_3)
+    # @param routes: {destination: [interface, cost, via]}
+    def loadRoutes(self, routes):
+        for i in range(1, len(self.nodes)):
+            self.cost[i] = self.infinity
+            self.nexthop[i] = -1
+            self.via[i] = -1
+        for dest in routes:
+            i = self.addNode(dest)
+            self.nexthop[i] = routes[dest][0]
+            self.cost[i] = routes[dest][1]
+            self.via[i] = self.nbrPos[routes[dest][2]]
+        self.hops = {}
+        self.version += 1
+        self.compileFIB()
+
+    ## Bellman-Ford step for the node at index i
+    # @return [neighbor position, cost], [-1, -1] if unreachable
+    def DV(self, i):
+        best = -1
+        cost = self.infinity
+        for k in range(len(self.neighbors)):
+            if(self.nbrNode[k] == i):
+                dv = 0
+            elif(self.vectors[k] is not None):
+                dv = self.vectors[k][i]
+            else:
+                continue
+            c = self.nbrCost[k] + dv
+            if(c < cost):
+                cost = c
+                best = k
+        return [best, cost] if best >= 0 else [-1, -1]
+
+    ## interfaces of every neighbor reaching the node at index i at the given cost
+    # @return sorted tuple of interfaces, empty unless there is more than one
+    def equalCostHops(self, i, cost):
+        hops = set()
+        for k in range(len(self.neighbors)):
+            if(self.nbrNode[k] == i):
+                dv = 0
+            elif(self.vectors[k] is not None):
+                dv = self.vectors[k][i]
+            else:
+                continue
+            if(self.nbrCost[k] + dv == cost):
+                hops.add(self.nbrIntf[k])
+        return tuple(sorted(hops)) if len(hops) > 1 else ()
+
+    ## recompute the route to the node at index i
+    # @return True if the route or its set of equal-cost next hops changed
+    def recompute(self, i):
+        k, cost = self.DV(i)
+        if(k < 0):
+            route = (-1, self.infinity, -1)
+            hops = ()
+        else:
+            route = (self.nbrIntf[k], cost, k)
+            hops = self.equalCostHops(i, cost)
+        if((route == (self.nexthop[i], self.cost[i], self.via[i])) and (hops == self.hops.get(i, ()))):
+            return False
+        if(hops):
+            self.hops[i] = hops
+        else:
+            self.hops.pop(i, None)
+        if(route[0] >= 0):
+            self.garbage.pop(i, None)
+        elif(self.collect and (self.nexthop[i] >= 0)):
+            self.garbage[i] = [self.nexthop[i], None]
+        self.nexthop[i], self.cost[i], self.via[i] = route
+        self.version += 1
+        return True
+
+    def setLinkCost(self, neighbor, cost):
+        k = self.nbrPos[neighbor]
+        if(self.nbrCost[k] == cost):
+            return []
+        self.nbrCost[k] = cost
+        self.links[neighbor][1] = cost
+        self.version += 1
+        changed = [self.nodes[i] for i in range(1, len(self.nodes)) if self.recompute(i)]
+        self.compileFIB()
+        return changed
+
+    def toStr(self, outIntF=None, poison=True):
+        retS = str(self.name) + ';'
+        for i in range(1, len(self.nodes)):
+            intF = self.nexthop[i]
+            if(intF < 0):
+                continue
+            if(intF == outIntF):
+                if(poison):
+                    retS += self.nodes[i] + ':' + str(intF) + ':' + str(self.infinity) + ';'
+                continue
+            retS += self.nodes[i] + ':' + str(intF) + ':' + str(self.cost[i]) + ';'
+        for i in list(self.garbage):
+            retS += self.nodes[i] + ':' + str(self.garbage[i][0]) + ':' + str(self.infinity) + ';'
+        return retS
+
+    ## age out routes, see RoutingTable.expireRoutes
+    def expireRoutes(self, now, timeout, gc):
+        changed = []
+        expired = False
+        for k in list(self.heard):
+            if(now - self.heard[k] < timeout):
+                continue
+            del self.heard[k]
+            expired = True
+            old = self.vectors[k]
+            self.vectors[k] = None
+            self.version += 1
+            for i in range(1, len(old)):
+                if((old[i] < self.infinity) and self.recompute(i) and (self.nodes[i] not in changed)):
+                    changed.append(self.nodes[i])
+        for i in list(self.garbage):
+            if(self.garbage[i][1] is None):
+                self.garbage[i][1] = now + gc
+            elif(self.garbage[i][1] <= now):
+                del self.garbage[i]
+        if(changed or expired):
+            #alternates depend on every neighbor's vector, not only the routes
+            self.compileFIB()
+        return changed
@@ -0,0 +1,148 @@
+import heapq
+
+## Path queries over the routing topology.
+# Answers "what are the k cheapest loop-free paths from a to b" with Yen's
+# algorithm on a graph built from every router's cost_D. Results are cached
+# per topology version and extended on demand, so asking for more paths
+# between the same pair only runs the extra Yen iterations. check_routes
+# compares what the routers' tables chose against the optimum.
+
+
+## every router's cost table, attached prefixes included
+# @param router_L: list of Router objects
+# @return {router: {neighbor: {interface: cost}}}
+def topology(router_L):
+    return {r.name: dict(r.cost_D, **r.prefix_D) for r in router_L}
+
+
+## cheapest path avoiding some nodes and edges (Dijkstra)
+# nodes that are not routers never carry transit traffic
+# @param graph: {node: {neighbor: cost}}
+# @param routers: set of nodes that may forward
+# @param banned_nodes: nodes the path may not visit
+# @param banned_edges: (u, v) edges the path may not use
+# @return [cost, [src, ..., dst]], None if dst cannot be reached
+def shortest_path(graph, routers, src, dst, banned_nodes=(), banned_edges=()):
+    dist = {src: 0}
+    parent = {src: None}
+    heap = [(0, src)]
+    done = set()
+    while heap:
+        d, u = heapq.heappop(heap)
+        if(u in done):
+            continue
+        done.add(u)
+        if(u == dst):
+            path = [u]
+            while parent[path[-1]] is not None:
+                path.append(parent[path[-1]])
+            path.reverse()
+            return [d, path]
+        if((u != src) and (u not in routers)):
+            continue
+        for v, c in graph.get(u, {}).items():
+            if((v in banned_nodes) or ((u, v) in banned_edges)):
+                continue
+            if((v not in dist) or (d + c < dist[v])):
+                dist[v] = d + c
+                parent[v] = u
+                heapq.heappush(heap, (d + c, v))
+    return None
+
+
+## k-shortest-path queries on one topology at a time
+class PathQuery:
+
+    ##@param cost_DD: every router's cost table {router: {neighbor: {interface: cost}}}
+    def __init__(self, cost_DD):
+        self.version = 0
+        self.cost_DD = None
+        self.graph = {}      # {node: {neighbor: cost}}
+        self.routers = set()
+        self.cache = {}      # {(src, dst): [found paths, candidate heap, paths seen]}
+        self.set_topology(cost_DD)
+
+    ## switch to a new topology, dropping cached paths if it differs
+    # @return current topology version
+    def set_topology(self, cost_DD):
+        if(cost_DD == self.cost_DD):
+            return self.version
+        self.cost_DD = {r: {n: dict(cost_DD[r][n]) for n in cost_DD[r]} for r in cost_DD}
+        self.routers = set(cost_DD)
+        self.graph = {}
+        for r in cost_DD:
+            for n, intf_D in cost_DD[r].items():
+                c = min(intf_D.values())
+                self.graph.setdefault(r, {})[n] = c
+                if(n not in cost_DD):
+                    #hosts and prefixes reach their router over the same link
+                    self.graph.setdefault(n, {})[r] = c
+        self.cache = {}
+        self.version += 1
+        return self.version
+
+    ## cost of a path in the current topology
+    def path_cost(self, path):
+        return sum(self.graph[path[j]][path[j + 1]] for j in range(len(path) - 1))
+
+    ## the k cheapest loop-free paths from src to dst (Yen's algorithm)
+    # @return list of [cost, [src, ..., dst]], cheapest first, fewer than k if no more exist
+    def paths(self, src, dst, k=1):
+        entry = self.cache.get((src, dst))
+        if(entry is None):
+            first = shortest_path(self.graph, self.routers, src, dst)
+            entry = [[first] if first is not None else [], [], set()]
+            if(first is not None):
+                entry[2].add(tuple(first[1]))
+            self.cache[(src, dst)] = entry
+        found, candidates, seen = entry
+        while (len(found) < k) and found:
+            prev = found[-1][1]
+            for i in range(len(prev) - 1):
+                spur = prev[i]
+                root = prev[:i + 1]
+                banned_edges = set()
+                for cost, path in found:
+                    if(path[:i + 1] == root):
+                        banned_edges.add((path[i], path[i + 1]))
+                spur_path = shortest_path(self.graph, self.routers, spur, dst, set(root[:-1]), banned_edges)
+                if(spur_path is None):
+                    continue
+                path = root[:-1] + spur_path[1]
+                if(tuple(path) in seen):
+                    continue
+                seen.add(tuple(path))
+                heapq.heappush(candidates, (self.path_cost(path), path))
+            if(not candidates):
+                break
+            cost, path = heapq.heappop(candidates)
+            found.append([cost, path])
+        return [list(p) for p in found[:k]]
+
+    ## cheapest path, None if dst cannot be reached
+    def best(self, src, dst):
+        found = self.paths(src, dst, 1)
+        return found[0] if found else None
+
+
+## compare the routers' routes with the cheapest paths of the topology
+# @param router_L: list of Router objects
+# @param query: PathQuery to use, one is built from router_L if None
+# @return list of [router, destination, cost in its table or None, optimal cost or None] that disagree
+def check_routes(router_L, query=None):
+    if(query is None):
+        query = PathQuery(topology(router_L))
+    else:
+        query.set_topology(topology(router_L))
+    wrong = []
+    for r in router_L:
+        routes = r.table.routes
+        for dest in set(routes) | set(query.graph):
+            if(dest == r.name):
+                continue
+            best = query.best(r.name, dest)
+            have = routes[dest][1] if dest in routes else None
+            want = best[0] if best is not None else None
+            if(have != want):
+                wrong.append([r.name, dest, have, want])
+    return wrong
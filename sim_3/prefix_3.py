@@ -0,0 +1,127 @@
+## Hierarchical numeric addresses and longest-prefix-match lookup.
+# Addresses are integers of addr_bits bits (small enough for the 5 character
+# destination field of NetworkPacket). A prefix is written 'address/length',
+# e.g. '256/8' covers 256..511, so one route can stand for every host behind
+# a router.
+
+## width of an address in bits
+addr_bits = 16
+
+
+## is this destination a prefix ('256/8') rather than a name or an address
+def is_prefix(dest):
+    return '/' in str(dest)
+
+
+## split a prefix string into [address, length], the address masked to length
+def parse_prefix(prefix):
+    addr, length = str(prefix).split('/')
+    length = int(length)
+    return [mask(int(addr), length), length]
+
+
+## keep only the top length bits of addr
+def mask(addr, length):
+    if(length == 0):
+        return 0
+    return addr & (((1 << length) - 1) << (addr_bits - length))
+
+
+## bit i of addr, counting from the most significant
+def bit(addr, i):
+    return (addr >> (addr_bits - 1 - i)) & 1
+
+
+## length of the common leading part of two prefixes
+def common_length(key_1, length_1, key_2, length_2):
+    diff = key_1 ^ key_2
+    same = addr_bits - diff.bit_length()
+    return min(same, length_1, length_2)
+
+
+## one node of a PrefixTrie, standing for the prefix key/length
+class TrieNode:
+    __slots__ = ('key', 'length', 'value', 'children')
+
+    def __init__(self, key, length, value=None):
+        self.key = key
+        self.length = length
+        self.value = value
+        self.children = [None, None]
+
+
+## Path-compressed binary trie (Patricia trie) for longest-prefix match
+# Chains of single-child nodes are collapsed, so a lookup visits at most one
+# node per distinct prefix length on the path rather than one per bit.
+class PrefixTrie:
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    ## insert or replace the value stored for a prefix
+    # @param prefix: prefix string 'address/length'
+    # @param value: value returned by lookups that match it (not None)
+    def insert(self, prefix, value):
+        key, length = parse_prefix(prefix)
+        new = TrieNode(key, length, value)
+        parent = None
+        node = self.root
+        while True:
+            if(node is None):
+                self.attach(parent, new)
+                self.size += 1
+                return
+            common = common_length(key, length, node.key, node.length)
+            if(common < node.length):
+                #the new prefix diverges inside this node's compressed path: split it
+                if(common == length):
+                    new.children[bit(node.key, length)] = node
+                    self.attach(parent, new)
+                else:
+                    split = TrieNode(mask(key, common), common)
+                    split.children[bit(node.key, common)] = node
+                    split.children[bit(key, common)] = new
+                    self.attach(parent, split)
+                self.size += 1
+                return
+            if(length == node.length):
+                if(node.value is None):
+                    self.size += 1
+                node.value = value
+                return
+            parent = node
+            node = node.children[bit(key, node.length)]
+
+    ## hang node under parent on the side its key says (or make it the root)
+    def attach(self, parent, node):
+        if(parent is None):
+            self.root = node
+        else:
+            parent.children[bit(node.key, parent.length)] = node
+
+    ## value of the longest prefix containing addr, None if no prefix does
+    # @param addr: integer address
+    def lookup(self, addr):
+        best = None
+        node = self.root
+        while node is not None:
+            if(mask(addr, node.length) != node.key):
+                break
+            if(node.value is not None):
+                best = node.value
+            if(node.length == addr_bits):
+                break
+            node = node.children[bit(addr, node.length)]
+        return best
+
+
+## build a trie from the prefix destinations of a forwarding table
+# @param fib: {destination: anything}, names that are not prefixes are skipped
+# @return PrefixTrie mapping each address to its longest matching prefix string
+def build_trie(fib):
+    trie = PrefixTrie()
+    for dest in fib:
+        if(is_prefix(dest)):
+            trie.insert(dest, dest)
+    return trie
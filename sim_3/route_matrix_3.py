@@ -0,0 +1,71 @@
+import numpy as np
+
+## Offline all-pairs route computation over a dense NumPy cost matrix.
+# Builds one matrix from every router's cost_D, runs a vectorized
+# Floyd-Warshall (one min-plus step per intermediate node) and loads the
+# resulting next hops straight into each Router's forwarding table, so data
+# plane runs can skip on-line convergence.
+
+
+## build the dense cost matrix
+# @param cost_DD: every router's cost table {router: {neighbor: {interface: cost}}}
+# @return [node list, {node: index}, n x n cost matrix with inf for no link]
+def cost_matrix(cost_DD):
+    nodes = list(cost_DD)
+    for r in cost_DD:
+        for neighbor in cost_DD[r]:
+            if(neighbor not in nodes):
+                nodes.append(neighbor)
+    index = {node: i for i, node in enumerate(nodes)}
+    cost = np.full((len(nodes), len(nodes)), np.inf)
+    np.fill_diagonal(cost, 0)
+    for r in cost_DD:
+        for neighbor, intf_D in cost_DD[r].items():
+            i, j = index[r], index[neighbor]
+            cost[i, j] = min(cost[i, j], min(intf_D.values()))
+    return [nodes, index, cost]
+
+
+## all-pairs shortest paths
+# @param cost: n x n cost matrix from cost_matrix
+# @return [dist, nxt] where nxt[i, j] is the index of the node after i on the
+#   shortest path to j, -1 if j is unreachable from i
+def all_pairs(cost):
+    n = cost.shape[0]
+    dist = cost.copy()
+    nxt = np.where(np.isfinite(cost), np.arange(n)[None, :], -1)
+    for k in range(n):
+        via = dist[:, k, None] + dist[None, k, :]
+        better = via < dist
+        dist = np.where(better, via, dist)
+        nxt = np.where(better, nxt[:, k, None], nxt)
+    return [dist, nxt]
+
+
+## routes of every router
+# @param cost_DD: every router's cost table {router: {neighbor: {interface: cost}}}
+# @return {router: {destination: [interface, cost, via]}}
+def route_tables(cost_DD):
+    nodes, index, cost = cost_matrix(cost_DD)
+    dist, nxt = all_pairs(cost)
+    tables = {}
+    for r, cost_D in cost_DD.items():
+        i = index[r]
+        routes = {}
+        for j, dest in enumerate(nodes):
+            if((j == i) or (nxt[i, j] < 0)):
+                continue
+            via = nodes[nxt[i, j]]
+            intf_D = cost_D[via]
+            intF = min(intf_D, key=lambda x: (intf_D[x], x))
+            routes[dest] = [intF, int(dist[i, j]), via]
+        tables[r] = routes
+    return tables
+
+
+## compute every router's routes offline and install them
+# @param router_L: list of Router objects making up the topology
+def load_routes(router_L):
+    tables = route_tables({r.name: dict(r.cost_D, **r.prefix_D) for r in router_L})
+    for r in router_L:
+        r.table.loadRoutes(tables[r.name])
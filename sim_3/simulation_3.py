@@ -1,16 +1,36 @@
 import network_3 as network
 import link_3 as link
+import timer_3 as timer
 import threading
 from time import sleep
 from rprint import print
 
 ##configuration parameters
 router_queue_size = 0 #0 means unlimited
-routing_time = 5
+routing_time = 5      #longest to wait for the routing tables to converge
 simulation_time = 5   #give the network sufficient time to execute transfers
+udp_links = False     #carry packets between nodes over loopback UDP sockets
+routing = 'dv'        #'dv' or 'dv-dense' for distance vector, 'ls' for link state,
+                      #'server' for routes computed by a route server
+precompute_routes = False #load routes computed offline (needs numpy) instead of converging
+refresh_interval = None #seconds between periodic routing updates, None turns them off
+routes_file = None    #save the converged routes here (.json or .csv), None to skip
+warm_start_file = None #start from routes saved here if the topology matches, else save them here
+fail_interface = None #(router, interface) to mark down before sending data, e.g. ('RA', 1)
+load_aware = False    #add queue depth to link costs so traffic entering the network avoids congested first links
+check_paths = False   #compare the converged routes with the cheapest paths of the topology
+police_rate = None    #data packets per second a router admits from each attached host, None for no limit
+batch_size = None     #forward packets in batches of up to this many against a NumPy FIB (needs numpy)
 
 if __name__ == '__main__':
     object_L = [] #keeps track of objects, so we can kill their threads at the end
+    monitor = network.ControlPlaneMonitor() #tells us when routing has converged
+    timer_D = {} #periodic update settings shared by all routers
+    if refresh_interval is not None:
+        timers = timer.TimerWheel() #one timer thread drives every router's periodic updates
+        object_L.append(timers)
+        timer_D = dict(timers=timers, refresh_interval=refresh_interval,
+                       route_timeout=3.5*refresh_interval, gc_time=2*refresh_interval)
     
     #create network hosts
     host_1 = network.Host('H1')
@@ -22,39 +42,93 @@ if __name__ == '__main__':
     cost_D = {'H1': {0: 1}, 'RB': {1: 1}, 'RC': {2:2}} # {neighbor: {interface: cost}}
     router_a = network.Router(name='RA', 
                               cost_D = cost_D,
-                              max_queue_size=router_queue_size)
+                              prefix_D = {'256/8': {0: 1}}, #addresses 256-511 sit behind interface 0
+                              max_queue_size=router_queue_size,
+                              routing=routing,
+                              monitor=monitor,
+                              load_aware=load_aware,
+                              police_rate=police_rate,
+                              batch_size=batch_size,
+                              **timer_D)
     object_L.append(router_a)
 
     cost_D = {'RA': {0: 2}, 'RD': {1: 1}} # {neighbor: {interface: cost}}
     router_b = network.Router(name='RB', 
                               cost_D = cost_D,
-                              max_queue_size=router_queue_size)
+                              max_queue_size=router_queue_size,
+                              routing=routing,
+                              monitor=monitor,
+                              load_aware=load_aware,
+                              police_rate=police_rate,
+                              batch_size=batch_size,
+                              **timer_D)
     object_L.append(router_b)
 
     cost_D = {'RA': {0: 1}, 'RD': {1: 2}} # {neighbor: {interface: cost}}
     router_c = network.Router(name='RC', 
                               cost_D = cost_D,
-                              max_queue_size=router_queue_size)
+                              max_queue_size=router_queue_size,
+                              routing=routing,
+                              monitor=monitor,
+                              load_aware=load_aware,
+                              police_rate=police_rate,
+                              batch_size=batch_size,
+                              **timer_D)
     object_L.append(router_c)
 
     cost_D = {'RB': {0: 2}, 'RC': {1: 1}, 'H2': {2: 1}} # {neighbor: {interface: cost}}
     router_d = network.Router(name='RD', 
                               cost_D = cost_D,
-                              max_queue_size=router_queue_size)
+                              prefix_D = {'512/8': {2: 1}}, #addresses 512-767 sit behind interface 2
+                              group_D = {'*G1': [2]}, #H2 is a member of multicast group *G1
+                              max_queue_size=router_queue_size,
+                              routing=routing,
+                              monitor=monitor,
+                              load_aware=load_aware,
+                              police_rate=police_rate,
+                              batch_size=batch_size,
+                              **timer_D)
     object_L.append(router_d)
     
     #create a Link Layer to keep track of links between network nodes
     link_layer = link.LinkLayer()
     object_L.append(link_layer)
+    Link = link.UdpLink if udp_links else link.Link
     
     #add all the links - need to reflect the connectivity in cost_D tables above
-    link_layer.add_link(link.Link(host_1, 0, router_a, 0))
-    link_layer.add_link(link.Link(router_a, 1, router_b, 0))
-    link_layer.add_link(link.Link(router_a, 2, router_c, 0))
-    link_layer.add_link(link.Link(router_d, 0, router_b, 1))
-    link_layer.add_link(link.Link(router_d, 1, router_c, 1))
-    link_layer.add_link(link.Link(host_2, 0, router_d, 2))
+    link_layer.add_link(Link(host_1, 0, router_a, 0))
+    link_layer.add_link(Link(router_a, 1, router_b, 0))
+    link_layer.add_link(Link(router_a, 2, router_c, 0))
+    link_layer.add_link(Link(router_d, 0, router_b, 1))
+    link_layer.add_link(Link(router_d, 1, router_c, 1))
+    link_layer.add_link(Link(host_2, 0, router_d, 2))
     
+    #in route server mode every router also has a link to the server
+    if routing == 'server':
+        routers = [router_a, router_b, router_c, router_d]
+        server = network.RouteServer('S1', {k: r.name for k, r in enumerate(routers)},
+                                     max_queue_size=router_queue_size, monitor=monitor)
+        object_L.append(server)
+        for k, r in enumerate(routers):
+            link_layer.add_link(Link(r, r.server_intf, server, k))
+    
+    
+    ## compute routing tables
+    # everything that writes to the tables runs before the routers' control
+    # threads start, so it cannot race their own updates
+    import export_3
+    router_L = [router_a, router_b, router_c, router_d]
+    warm = warm_start_file is not None and export_3.load_routes(router_L, warm_start_file)
+    if warm:
+        print("Loaded saved routes from %s" % warm_start_file)
+    elif precompute_routes:
+        import route_matrix_3
+        route_matrix_3.load_routes(router_L)
+    elif routing == 'server':
+        for r in router_L:
+            r.send_routes(r.server_intf) #each router reports its links to the server
+    else:
+        router_a.send_routes(1) #one update starts the routing process
     
     #start all the objects
     thread_L = []
@@ -64,9 +138,20 @@ if __name__ == '__main__':
     for t in thread_L:
         t.start()
     
-    ## compute routing tables
-    router_a.send_routes(1) #one update starts the routing process
-    sleep(routing_time)  #let the tables converge
+    converged = True
+    if not (warm or precompute_routes):
+        conv_time, messages = monitor.wait_converged(routing_time) #let the tables converge
+        converged = conv_time is not None
+        if conv_time is None:
+            print("Routing did not converge within %s seconds (%d control packets)" % (routing_time, messages))
+        else:
+            print("Routing converged in %.3f seconds with %d control packets" % (conv_time, messages))
+    if warm_start_file is not None and not warm:
+        if converged:
+            export_3.save_routes(router_L, warm_start_file)
+            print("Saved converged routes to %s" % warm_start_file)
+        else:
+            print("Not saving partial routes to %s" % warm_start_file)
     router_a.print_routes2()
     router_b.print_routes2()
     router_c.print_routes2()
@@ -76,6 +161,14 @@ if __name__ == '__main__':
     for obj in object_L:
         if str(type(obj)) == "<class 'network.Router'>":
             obj.print_routes()
+    if check_paths:
+        import paths_3
+        for name, dest, have, want in paths_3.check_routes(router_L):
+            print("%s: route to %s costs %s, the best path costs %s" % (name, dest, have, want))
+        print("Checked routes against the cheapest paths")
+    if routes_file is not None:
+        export_3.export_routes(router_L, routes_file)
+        print("Saved converged routes to %s" % routes_file)
 
 ##    print()
 ##    router_a.table.DVother('H1', 'RB')
@@ -83,9 +176,24 @@ if __name__ == '__main__':
 ##    router_a.table.DVother('H2', 'RA')
 ##    print()
 
+    if fail_interface is not None:
+        name, intf = fail_interface
+        for r in router_L:
+            if r.name == name:
+                r.interface_down(intf) #traffic over it moves to the loop-free alternate
+        print("Marked %s interface %d down" % fail_interface)
+
     #send packet from host 1 to host 2
     host_1.udt_send('H2', 'MESSAGE_FROM_H1')
+    #and one to a numeric address in the prefix behind RD
+    host_1.udt_send('513', 'MESSAGE_TO_513')
+    #and one to multicast group *G1 and one broadcast
+    host_1.udt_send('*G1', 'MESSAGE_TO_G1')
+    host_1.udt_send('*', 'BROADCAST_FROM_H1')
     sleep(simulation_time)
+    if police_rate is not None:
+        for r in router_L:
+            print("%s: policer dropped %s" % (r, r.policed_D))
 ##    print("REVERSE")
 ##    host_2.udt_send('H1', 'MESSAGE_FROM_H2')
 ##    sleep(simulation_time)
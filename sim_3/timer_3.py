@@ -0,0 +1,70 @@
+import math
+import threading
+import time
+from rprint import print
+
+
+## A hashed timer wheel shared by every router in a simulation
+# One thread advances the wheel one slot per tick and runs the callbacks that
+# are due, so scheduling and cancelling cost O(1) however many timers exist.
+# Callbacks run on the wheel thread and should only hand work to their owner.
+class TimerWheel:
+
+    ##@param tick: seconds per slot
+    # @param slots: number of slots on the wheel
+    def __init__(self, tick=0.01, slots=512):
+        self.tick = tick
+        self.slots = slots
+        self.wheel = [[] for _ in range(slots)]  # each slot holds [rounds left, callback, cancelled]
+        self.current = 0
+        self.lock = threading.Lock()
+        self.stop = False #for thread termination
+
+    ## called when printing the object
+    def __str__(self):
+        return 'TimerWheel'
+
+    ## run callback once, delay seconds from now
+    # @return handle that can be passed to cancel
+    def schedule(self, delay, callback):
+        ticks = max(1, int(math.ceil(delay / self.tick)))
+        timer = [(ticks - 1) // self.slots, callback, False]
+        with self.lock:
+            self.wheel[(self.current + ticks) % self.slots].append(timer)
+        return timer
+
+    ## stop a scheduled callback from running
+    def cancel(self, timer):
+        timer[2] = True
+
+    ## move the wheel one slot and run whatever is due there
+    def advance(self):
+        due = []
+        with self.lock:
+            self.current = (self.current + 1) % self.slots
+            keep = []
+            for timer in self.wheel[self.current]:
+                if(timer[2]):
+                    continue
+                if(timer[0] == 0):
+                    due.append(timer)
+                else:
+                    timer[0] -= 1
+                    keep.append(timer)
+            self.wheel[self.current] = keep
+        for timer in due:
+            timer[1]()
+
+    ## thread target for the wheel to keep ticking
+    def run(self):
+        print (threading.currentThread().getName() + ': Starting')
+        next_tick = time.time()
+        while True:
+            next_tick += self.tick
+            delay = next_tick - time.time()
+            if(delay > 0):
+                time.sleep(delay)
+            self.advance()
+            if self.stop:
+                print (threading.currentThread().getName() + ': Ending')
+                return
@@ -0,0 +1,112 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from linkstate_3 import ShortestPathTree
+
+## Offline what-if analysis of single failures.
+# Builds one shortest path tree per router from every router's cost_D, then
+# for each single-link and single-router failure repairs copies of those
+# trees with ShortestPathTree.setEdges instead of running Dijkstra again, and
+# reports the routes that change. Scenarios are spread over a process pool.
+
+
+## directed graph of the topology
+# @param cost_DD: every router's cost table {router: {neighbor: {interface: cost}}}
+# @return {node: {neighbor: cost}}, hosts have no out-edges so never carry transit traffic
+def graph_of(cost_DD):
+    return {r: {n: min(cost_DD[r][n].values()) for n in cost_DD[r]} for r in cost_DD}
+
+
+## every single failure of the topology
+# @return list of ('link', u, v) with u < v, then ('node', router)
+def scenarios(cost_DD):
+    links = set()
+    for r in cost_DD:
+        for n in cost_DD[r]:
+            links.add(tuple(sorted([r, n])))
+    return [('link',) + link for link in sorted(links)] + [('node', r) for r in sorted(cost_DD)]
+
+
+## route of root to dest on a tree, None if unreachable
+def route_of(cost_DD, tree, dest):
+    if(dest not in tree.dist):
+        return None
+    via = tree.firsthop[dest]
+    intf_D = cost_DD[tree.root][via]
+    return [min(intf_D, key=lambda x: (intf_D[x], x)), tree.dist[dest], via]
+
+
+## routes of every router before any failure
+# @return {router: {destination: [interface, cost, via]}}
+def base_routes(cost_DD, trees):
+    return {r: {d: route_of(cost_DD, trees[r], d) for d in trees[r].dist if d != r} for r in trees}
+
+
+## state the analysis runs on, one copy per worker process
+class Analysis:
+
+    ##@param cost_DD: every router's cost table {router: {neighbor: {interface: cost}}}
+    def __init__(self, cost_DD):
+        self.cost_DD = cost_DD
+        self.graph = graph_of(cost_DD)
+        self.trees = {r: ShortestPathTree(r, self.graph) for r in cost_DD}
+
+    ## new out-edges of the nodes a failure touches
+    # @return {node: {neighbor: cost}}
+    def edge_changes(self, scenario):
+        changes = {}
+        if(scenario[0] == 'link'):
+            u, v = scenario[1:]
+            for a, b in ((u, v), (v, u)):
+                if(b in self.graph.get(a, {})):
+                    changes[a] = {n: c for n, c in self.graph[a].items() if n != b}
+        else:
+            dead = scenario[1]
+            changes[dead] = {}
+            for a in self.graph:
+                if(dead in self.graph[a]):
+                    changes[a] = {n: c for n, c in self.graph[a].items() if n != dead}
+        return changes
+
+    ## routes that change under one failure
+    # @param scenario: ('link', u, v) or ('node', router)
+    # @return {router: {destination: [interface, cost, via] or None if lost}}, a failed router has no entry
+    def run(self, scenario):
+        changes = self.edge_changes(scenario)
+        result = {}
+        for r in self.trees:
+            if((scenario[0] == 'node') and (scenario[1] == r)):
+                continue
+            tree = self.trees[r].copy()
+            moved = set()
+            for u in changes:
+                moved |= tree.setEdges(u, changes[u])
+            moved.discard(r)
+            if(moved):
+                result[r] = {d: route_of(self.cost_DD, tree, d) for d in moved}
+        return [scenario, result]
+
+
+## per-process Analysis built by the pool initializer
+worker = None
+
+def init_worker(cost_DD):
+    global worker
+    worker = Analysis(cost_DD)
+
+def run_worker(scenario):
+    return worker.run(scenario)
+
+
+## changed routes of every router under every single-link and single-router failure
+# @param cost_DD: every router's cost table {router: {neighbor: {interface: cost}}}
+# @param workers: processes to use, None for one per CPU, 0 to run in this process
+# @return {scenario: {router: {destination: [interface, cost, via] or None}}}
+def analyze(cost_DD, workers=None):
+    scenario_L = scenarios(cost_DD)
+    if(workers == 0):
+        analysis = Analysis(cost_DD)
+        return dict(analysis.run(s) for s in scenario_L)
+    workers = workers or os.cpu_count() or 1
+    chunk = max(1, len(scenario_L) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(cost_DD,)) as pool:
+        return dict(pool.map(run_worker, scenario_L, chunksize=chunk))